@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ANALYTICS_BACKEND = "numpy" if numpy is not None else "array"
+
+DIMENSIONS = ("month", "channel", "counterparty")
+# Dictionary codes are stored as unsigned ints; NumPy reads the same buffer without copying.
+CODE_TYPE = "I"
+
+# Per group: [spent, received, count]
+Totals = List[List[float]]
+
+
+class Column:
+    # A dictionary-encoded string column: every distinct value gets a small integer code,
+    # so grouping is a bincount over codes instead of hashing strings row by row.
+    __slots__ = ("labels", "index", "codes")
+
+    def __init__(self) -> None:
+        self.labels: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.codes = array(CODE_TYPE)
+
+    def encode(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+
+def _as_numpy(column: array, start: int = 0) -> Any:
+    return numpy.frombuffer(column, dtype=f"{'f' if column.typecode == 'd' else 'u'}{column.itemsize}")[start:]
+
+
+def group_totals(codes: Sequence[int], amounts: Sequence[float], size: int) -> Totals:
+    if numpy is not None:
+        codes = numpy.asarray(codes)
+        amounts = numpy.asarray(amounts)
+        spent = numpy.bincount(codes, weights=numpy.where(amounts < 0, -amounts, 0.0), minlength=size)
+        received = numpy.bincount(codes, weights=numpy.where(amounts > 0, amounts, 0.0), minlength=size)
+        counts = numpy.bincount(codes, minlength=size)
+        return [spent.tolist(), received.tolist(), counts.tolist()]
+    spent, received, counts = [0.0] * size, [0.0] * size, [0] * size
+    for code, amount in zip(codes, amounts):
+        if amount < 0:
+            spent[code] -= amount
+        else:
+            received[code] += amount
+        counts[code] += 1
+    return [spent, received, counts]
+
+
+class AccountAnalytics:
+    # Columnar copy of one account's history plus running per-group totals. New rows are
+    # appended with extend(), which only aggregates the new slice and adds it on top, so a
+    # transfer costs O(new rows) instead of a rescan of the whole history.
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.amounts = array("d")
+        self.columns = {dimension: Column() for dimension in DIMENSIONS}
+        self.totals: Dict[str, Totals] = {dimension: [[], [], []] for dimension in DIMENSIONS}
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> int:
+        start = len(self.amounts)
+        month, channel, counterparty = (self.columns[dimension] for dimension in DIMENSIONS)
+        for row in rows:
+            self.amounts.append(float(row.get("amount", 0)))
+            month.codes.append(month.encode(str(row.get("date", ""))[:7]))
+            channel.codes.append(channel.encode(row.get("channel") or "other"))
+            counterparty.codes.append(counterparty.encode(row.get("counterparty") or row.get("description") or ""))
+            self.last_id = max(self.last_id, row["id"])
+        added = len(self.amounts) - start
+        if added:
+            amounts = self._slice(self.amounts, start)
+            for dimension, column in self.columns.items():
+                size = len(column.labels)
+                fresh = group_totals(self._slice(column.codes, start), amounts, size)
+                for current, delta in zip(self.totals[dimension], fresh):
+                    current.extend([0.0] * (size - len(current)))
+                    for code, value in enumerate(delta):
+                        if value:
+                            current[code] += value
+        return added
+
+    @staticmethod
+    def _slice(column: array, start: int) -> Sequence[Any]:
+        if numpy is not None:
+            return _as_numpy(column, start)
+        return memoryview(column)[start:]
+
+    def filtered_totals(self, month_from: Optional[str], month_to: Optional[str]) -> Dict[str, Totals]:
+        # A month range is a mask over the month codes; the masked rows are regrouped from the
+        # columns, which is still one vectorised pass and leaves the running totals untouched.
+        labels = self.columns["month"].labels
+        allowed = [
+            (month_from is None or label >= month_from) and (month_to is None or label <= month_to) for label in labels
+        ]
+        if numpy is not None:
+            mask = numpy.asarray(allowed, dtype=bool)[_as_numpy(self.columns["month"].codes)]
+            amounts = _as_numpy(self.amounts)[mask]
+            return {
+                dimension: group_totals(_as_numpy(column.codes)[mask], amounts, len(column.labels))
+                for dimension, column in self.columns.items()
+            }
+        rows = [position for position, code in enumerate(self.columns["month"].codes) if allowed[code]]
+        amounts = [self.amounts[position] for position in rows]
+        return {
+            dimension: group_totals([column.codes[position] for position in rows], amounts, len(column.labels))
+            for dimension, column in self.columns.items()
+        }
+
+    def summary(self, month_from: Optional[str] = None, month_to: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+        totals = self.totals if month_from is None and month_to is None else self.filtered_totals(month_from, month_to)
+        groups = {dimension: _groups(self.columns[dimension].labels, totals[dimension]) for dimension in DIMENSIONS}
+        return {
+            "transactions": sum(group["count"] for group in groups["month"]),
+            "months": sorted(groups["month"], key=lambda group: group["key"]),
+            "channels": sorted(groups["channel"], key=_by_spent),
+            "counterparties": sorted(groups["counterparty"], key=_by_spent)[:top],
+            "engine": ANALYTICS_BACKEND,
+        }
+
+
+def _by_spent(group: Dict[str, Any]) -> Any:
+    return -group["spent"], group["key"]
+
+
+def _groups(labels: List[str], totals: Totals) -> List[Dict[str, Any]]:
+    spent, received, counts = totals
+    return [
+        {
+            "key": label,
+            "spent": round(spent[code], 2),
+            "received": round(received[code], 2),
+            "net": round(received[code] - spent[code], 2),
+            "count": int(counts[code]),
+        }
+        for code, label in enumerate(labels)
+        if counts[code]
+    ]
+
@@ -1,30 +1,116 @@
 from __future__ import annotations
 
 import copy
+import csv
+import dataclasses
+import hashlib
 import io
 import json
+import math
+import os
 import random
-import unicodedata
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
+import click
 from flask import (
     Flask,
     Response,
+    before_render_template,
     flash,
+    g,
+    has_app_context,
     redirect,
     render_template,
     request,
     session,
+    template_rendered,
     url_for,
 )
+from markupsafe import Markup
+
+from analytics import AccountAnalytics
+from cache import FragmentCache, LRUCache, StatementCache
+from jobs import Job, JobQueue, JobResult, JobRunner
+from metrics import (
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS,
+    SLOW_REQUESTS,
+    TEMPLATE_SECONDS,
+    SamplingProfiler,
+    gauge_lines,
+    instrument_storage,
+)
+from models import UserRecord
+from qr import QRDecodeError, decode_qr, qr_cache
+from statements import iter_statement_csv, iter_statement_pdf
+from support import SupportStore, UnknownConversationError
+from storage import (
+    NOTIFICATION_RETENTION,
+    DuplicateContactError,
+    InsufficientFundsError,
+    InvalidAmountError,
+    Posting,
+    Storage,
+    migrate_json_to_sqlite,
+    open_storage,
+    patch_target,
+)
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "demo_data.json"
+STORAGE_PATH = Path(os.environ.get("ALTERNATIF_BANK_STORAGE", DATA_PATH))
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "alternatif-bank-experience"
+app.config["STATEMENT_PDF_COMPRESS"] = True
+
+storage: Storage = instrument_storage(
+    open_storage(
+        STORAGE_PATH,
+        notification_retention=int(os.environ.get("ALTERNATIF_BANK_NOTIFICATION_RETENTION", NOTIFICATION_RETENTION)),
+    )
+)
+user_cache = LRUCache(maxsize=int(os.environ.get("ALTERNATIF_BANK_USER_CACHE", 1024)))
+statement_cache = StatementCache(
+    maxsize=int(os.environ.get("ALTERNATIF_BANK_STATEMENT_CACHE", 64)),
+    directory=os.environ.get("ALTERNATIF_BANK_STATEMENT_CACHE_DIR") or None,
+)
+# Per user: (history generation, {iban: AccountAnalytics}). Entries catch up with new transactions on read.
+analytics_cache = LRUCache(maxsize=int(os.environ.get("ALTERNATIF_BANK_ANALYTICS_CACHE", 256)))
+# Rendered dashboard sections per (user, section); 0 turns fragment caching off.
+fragment_cache = FragmentCache(maxsize=int(os.environ.get("ALTERNATIF_BANK_FRAGMENT_CACHE", 4096)))
+FRAGMENT_SECTIONS = ("accounts", "payments", "cards")
+
+# Autopay runs in the background only when an interval (seconds) is configured; otherwise
+# `flask --app app run-autopay` executes due payments on demand.
+AUTOPAY_INTERVAL = float(os.environ.get("ALTERNATIF_BANK_AUTOPAY_INTERVAL", 0))
+job_queue = JobQueue(
+    STORAGE_PATH.with_name(f"{STORAGE_PATH.stem}.jobs.db"),
+    max_pending=int(os.environ.get("ALTERNATIF_BANK_JOB_QUEUE_LIMIT", 10_000)),
+)
+# Support chats are kept out of the user record; threads idle for ALTERNATIF_BANK_SUPPORT_ARCHIVE_DAYS
+# are compressed (`flask --app app archive-support` sweeps them all).
+support_store = SupportStore(
+    STORAGE_PATH.with_name(f"{STORAGE_PATH.stem}.support.db"),
+    archive_after=float(os.environ.get("ALTERNATIF_BANK_SUPPORT_ARCHIVE_DAYS", 30)) * 24 * 3600,
+)
+
+# Opt-in: requests slower than the threshold leave folded stacks in profiles/<endpoint>.folded.
+PROFILE_SLOW_MS = os.environ.get("ALTERNATIF_BANK_PROFILE_SLOW_MS")
+profiler: Optional[SamplingProfiler] = (
+    SamplingProfiler(
+        os.environ.get("ALTERNATIF_BANK_PROFILE_DIR") or BASE_DIR / "profiles",
+        threshold=float(PROFILE_SLOW_MS) / 1000,
+        interval=float(os.environ.get("ALTERNATIF_BANK_PROFILE_INTERVAL_MS", 5)) / 1000,
+    )
+    if PROFILE_SLOW_MS
+    else None
+)
 
 TRANSLATIONS = {
     "tr": {
@@ -72,27 +158,25 @@ TRANSLATIONS = {
 }
 
 
-def load_data() -> Dict[str, Any]:
-    if DATA_PATH.exists():
-        return json.loads(DATA_PATH.read_text(encoding="utf-8"))
-    DATA_PATH.write_text(json.dumps(DEFAULT_DATA, indent=2, ensure_ascii=False), encoding="utf-8")
-    return copy.deepcopy(DEFAULT_DATA)
-
-
-def save_data(data: Dict[str, Any]) -> None:
-    DATA_PATH.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-
-
-DEFAULT_DATA: Dict[str, Any] = {
-    "next_user_id": 1,
-    "users": [],
-    "billers": [
-        {"id": "electricity", "name": "Elektrik"},
-        {"id": "water", "name": "Su"},
-        {"id": "gsm", "name": "GSM"},
-    ],
-}
-
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+SUPPORT_PAGE_SIZE = 20
+SUPPORT_GREETING = "Merhaba, nasıl yardımcı olabiliriz?"
+NOTIFICATION_PAGE_SIZE = 10
+# A long-poll holds its worker thread for up to this many seconds; 0 turns it into plain polling.
+NOTIFICATION_MAX_WAIT = float(os.environ.get("ALTERNATIF_BANK_NOTIFICATION_WAIT", 25))
+# Writes from this process wake waiters at once; other worker processes are seen on this tick.
+NOTIFICATION_POLL_INTERVAL = 1.0
+notification_events = threading.Condition()
+# At most this many requests per process sit in a long-poll; once they are taken the feed
+# answers at once like a short poll, so idle dashboards can never occupy every worker thread.
+NOTIFICATION_MAX_WAITERS = int(os.environ.get("ALTERNATIF_BANK_NOTIFICATION_WAITERS", 8))
+# Seconds a client that was not held should wait before asking again.
+NOTIFICATION_RETRY_AFTER = 10
+notification_waiters = threading.BoundedSemaphore(max(NOTIFICATION_MAX_WAITERS, 0))
+BATCH_TRANSFER_LIMIT = 1000
+BATCH_TRANSFER_FIELDS = ("iban", "amount", "description", "fast")
+TRANSACTION_CHANNELS = ("FAST", "Havale", "Kart", "Ödeme")
 
 MOCK_TRANSACTIONS = [
     {
@@ -119,91 +203,33 @@ MOCK_TRANSACTIONS = [
 ]
 
 
-def _escape_pdf_text(text: str) -> str:
-    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
-    return (
-        ascii_text.replace("\\", "\\\\")
-        .replace("(", "\\(")
-        .replace(")", "\\)")
-    )
-
-
-def _build_pdf_from_lines(lines: list[str]) -> bytes:
-    text_ops = ["BT", "/F1 14 Tf", "50 800 Td"]
-    for index, line in enumerate(lines):
-        if index > 0:
-            text_ops.append("0 -18 Td")
-        text_ops.append(f"({_escape_pdf_text(line)}) Tj")
-    text_ops.append("ET")
-    stream = "\n".join(text_ops).encode("latin1", errors="replace")
-
-    objects: list[bytes] = [
-        b"<< /Type /Catalog /Pages 2 0 R >>",
-        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
-        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
-        b"<< /Length "
-        + str(len(stream)).encode("latin1")
-        + b" >>\nstream\n"
-        + stream
-        + b"\nendstream",
-        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
-    ]
-
-    buffer = io.BytesIO()
-    buffer.write(b"%PDF-1.4\n")
-    offsets = [0]
-    for obj_id, content in enumerate(objects, start=1):
-        offsets.append(buffer.tell())
-        buffer.write(f"{obj_id} 0 obj\n".encode("latin1"))
-        buffer.write(content)
-        buffer.write(b"\nendobj\n")
-
-    xref_pos = buffer.tell()
-    buffer.write(f"xref\n0 {len(objects) + 1}\n".encode("latin1"))
-    buffer.write(b"0000000000 65535 f \n")
-    for offset in offsets[1:]:
-        buffer.write(f"{offset:010} 00000 n \n".encode("latin1"))
-    buffer.write(b"trailer\n")
-    buffer.write(f"<< /Size {len(objects) + 1} /Root 1 0 R >>\n".encode("latin1"))
-    buffer.write(b"startxref\n")
-    buffer.write(f"{xref_pos}\n".encode("latin1"))
-    buffer.write(b"%%EOF")
-    return buffer.getvalue()
-
-
-def build_statement_pdf(transactions: list[Dict[str, Any]]) -> bytes:
-    lines = ["Alternatif Bank - Hesap Özeti", ""]
-    for trx in transactions[:20]:
-        lines.append(
-            f"{trx['date']} | {trx['description']} | {trx['amount']} TRY"
-        )
-    return _build_pdf_from_lines(lines)
-
-
-def generate_mock_iban(existing_ibans: Set[str]) -> str:
+def generate_mock_iban(iban_taken: Callable[[str], bool], minted: Set[str]) -> str:
     while True:
         digits = "".join(random.choice("0123456789") for _ in range(24))
         iban = f"TR{digits}"
-        if iban not in existing_ibans:
-            existing_ibans.add(iban)
+        if iban not in minted and not iban_taken(iban):
+            minted.add(iban)
             return iban
 
 
 def build_default_user(
-    full_name: str, contact: str, contact_type: str, existing_ibans: Optional[Set[str]] = None
+    full_name: str,
+    contact: str,
+    contact_type: str,
+    iban_taken: Optional[Callable[[str], bool]] = None,
 ) -> Dict[str, Any]:
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    existing_ibans = set(existing_ibans or set())
+    iban_taken = iban_taken or (lambda iban: False)
+    minted: Set[str] = set()
     accounts = [
         {
             "name": "Vadesiz TRY",
-            "iban": generate_mock_iban(existing_ibans),
+            "iban": generate_mock_iban(iban_taken, minted),
             "balance": 12850.75,
             "transactions": copy.deepcopy(MOCK_TRANSACTIONS),
         },
         {
             "name": "Birikim TRY",
-            "iban": generate_mock_iban(existing_ibans),
+            "iban": generate_mock_iban(iban_taken, minted),
             "balance": 3250.00,
             "transactions": [],
         },
@@ -257,9 +283,6 @@ def build_default_user(
             "autopay": False,
         },
     ]
-    support_messages = [
-        {"sender": "agent", "message": "Merhaba, nasıl yardımcı olabiliriz?", "timestamp": now},
-    ]
     return {
         "full_name": full_name,
         "contact": contact,
@@ -274,26 +297,119 @@ def build_default_user(
         "cards": cards,
         "payments": payments,
         "notifications": notifications,
-        "support_messages": support_messages,
     }
 
 
-def get_current_user() -> Optional[Dict[str, Any]]:
+def load_user(user_id: int) -> Optional[UserRecord]:
+    version = storage.user_version(user_id)
+    if version is None:
+        return None
+    cached = user_cache.get(user_id)
+    if cached is None or cached[0] != version:
+        data = storage.get_user(user_id, lazy=True)
+        if data is None:
+            return None
+        cached = (version, UserRecord.from_dict(data, storage.user_section))
+        user_cache.put(user_id, cached)
+    return cached[1].copy()
+
+
+def get_current_user() -> Optional[UserRecord]:
     user_id = session.get("user_id")
     if not user_id:
         return None
-    data = load_data()
-    for user in data["users"]:
-        if user["id"] == user_id:
-            return user
-    return None
+    memo = g.get("current_user")
+    if memo is None or memo[0] != user_id:
+        memo = (user_id, load_user(user_id))
+        g.current_user = memo
+    return memo[1]
+
+
+@app.before_request
+def start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+    if profiler is not None:
+        profiler.start(threading.get_ident())
+
+
+@app.after_request
+def record_request(response: Response) -> Response:
+    started = g.get("request_started")
+    if started is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    method = request.method
+    status = str(response.status_code)
+    ident = threading.get_ident()
+    waited = g.get("long_poll_wait", 0.0)
+
+    def finish() -> None:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe((endpoint, method), elapsed)
+        REQUESTS.inc((endpoint, method, status))
+        if profiler is not None:
+            samples = profiler.stop(ident)
+            # Time a long-poll spent waiting for news is not slowness worth a profile.
+            if elapsed - waited >= profiler.threshold:
+                SLOW_REQUESTS.inc((endpoint,))
+                profiler.dump(endpoint, samples)
+
+    # Exports stream their body after this hook returns, so those are timed when the
+    # server closes the response.
+    if response.is_streamed:
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender: Flask, template: Any, context: Dict[str, Any], **extra: Any) -> None:
+    g.template_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def record_template(sender: Flask, template: Any, context: Dict[str, Any], **extra: Any) -> None:
+    started = g.pop("template_started", None)
+    if started is not None:
+        TEMPLATE_SECONDS.observe((template.name or "inline",), time.perf_counter() - started)
+
+
+@REGISTRY.collector
+def cache_metrics() -> List[str]:
+    caches = {
+        "user": user_cache,
+        "statement": statement_cache,
+        "qr": qr_cache,
+        "analytics": analytics_cache,
+        "fragment": fragment_cache,
+    }
+    lookups = {}
+    for name, cache in caches.items():
+        lookups[(name, "hit")] = cache.hits
+        lookups[(name, "miss")] = cache.misses
+    return [
+        *gauge_lines("alternatif_bank_cache_requests_total", "Cache lookups by result.", "counter", ("cache", "result"), lookups),
+        *gauge_lines(
+            "alternatif_bank_cache_entries", "Entries currently cached.", "gauge", ("cache",),
+            {(name,): len(cache) for name, cache in caches.items()},
+        ),
+    ]
+
+
+def current_texts() -> Dict[str, str]:
+    # Resolved once per request and shared by the page, its fragments and the context processor.
+    texts = g.get("texts")
+    if texts is None:
+        user = get_current_user()
+        language = user.get("language") if user else "tr"
+        texts = g.texts = TRANSLATIONS.get(language, TRANSLATIONS["tr"])
+    return texts
 
 
 @app.context_processor
 def inject_texts() -> Dict[str, Any]:
-    user = get_current_user()
-    language = user.get("language") if user else "tr"
-    return {"texts": TRANSLATIONS.get(language, TRANSLATIONS["tr"])}
+    return {"texts": current_texts()}
 
 
 def login_required(view):
@@ -325,8 +441,7 @@ def register():
         if not full_name or not contact:
             flash("Ad soyad ve iletişim bilgisi zorunludur.", "danger")
         else:
-            data = load_data()
-            exists = next((u for u in data["users"] if u["contact"].lower() == contact.lower()), None)
+            exists = storage.find_user_id_by_contact(contact)
             if exists:
                 flash("Bu iletişim bilgisiyle bir hesap zaten mevcut, lütfen giriş yapın.", "warning")
                 return redirect(url_for("login"))
@@ -348,12 +463,11 @@ def login():
         if not contact:
             flash("Lütfen e-posta ya da telefon girin.", "danger")
         else:
-            data = load_data()
-            user = next((u for u in data["users"] if u["contact"].lower() == contact.lower()), None)
-            if not user:
+            user_id = storage.find_user_id_by_contact(contact)
+            if not user_id:
                 flash("Kayıtlı kullanıcı bulunamadı. Hemen kayıt olun.", "warning")
                 return redirect(url_for("register"))
-            session["otp_context"] = {"mode": "login", "user_id": user["id"]}
+            session["otp_context"] = {"mode": "login", "user_id": user_id}
             flash("Doğrulama kodu gönderildi. Demo OTP: 123456", "info")
             return redirect(url_for("verify_otp"))
     return render_template("login.html", user=None)
@@ -370,24 +484,19 @@ def verify_otp():
         if otp != "123456":
             flash("Geçersiz OTP, lütfen yeniden deneyin.", "danger")
         else:
-            data = load_data()
             if context.get("mode") == "register":
-                existing_ibans = {
-                    account["iban"]
-                    for user_item in data["users"]
-                    for account in user_item.get("accounts", [])
-                    if account.get("iban")
-                }
                 new_user = build_default_user(
                     context["full_name"],
                     context["contact"],
                     context["contact_type"],
-                    existing_ibans,
+                    storage.iban_exists,
                 )
-                new_user["id"] = data["next_user_id"]
-                data["next_user_id"] += 1
-                data["users"].append(new_user)
-                save_data(data)
+                try:
+                    storage.create_user(new_user)
+                except DuplicateContactError:
+                    session.pop("otp_context", None)
+                    flash("Bu iletişim bilgisiyle bir hesap zaten mevcut, lütfen giriş yapın.", "warning")
+                    return redirect(url_for("login"))
                 session["user_id"] = new_user["id"]
                 flash("Kayıt tamamlandı, hoş geldiniz!", "success")
             else:
@@ -405,36 +514,305 @@ def logout():
     return redirect(url_for("login"))
 
 
-def persist_user(updated_user: Dict[str, Any]) -> None:
-    data = load_data()
-    for idx, user in enumerate(data["users"]):
-        if user["id"] == updated_user["id"]:
-            data["users"][idx] = updated_user
-            save_data(data)
-            return
+def persist_user(updated_user: UserRecord) -> None:
+    changes = updated_user.changes()
+    if changes is None:
+        storage.save_user(updated_user.to_dict())
+    elif changes:
+        storage.patch_user(updated_user.id, changes)
+    else:
+        return
+    updated_user.mark_clean()
+    user_cache.pop(updated_user.id)
+    fragment_cache.invalidate(updated_user.id, changed_fragments(changes))
+    # Also called from CLI commands and background jobs, where there is no request to reset.
+    if has_app_context():
+        g.pop("texts", None)
+
+
+def changed_fragments(changes: Optional[List[Dict[str, Any]]]) -> Tuple[str, ...]:
+    # A full save (no diff) or a language switch affects every fragment.
+    if changes is None:
+        return FRAGMENT_SECTIONS
+    names = {patch_target(op["path"])[0] for op in changes}
+    if "language" in names:
+        return FRAGMENT_SECTIONS
+    return tuple(section for section in FRAGMENT_SECTIONS if section in names)
+
+
+def post_ledger(postings: List[Posting]) -> None:
+    for user_id in storage.post(postings):
+        user_cache.pop(user_id)
+        statement_cache.invalidate_user(user_id)
+        fragment_cache.invalidate(user_id, ("accounts",))
+    g.pop("current_user", None)
+    if any(posting.notification for posting in postings):
+        announce_notifications()
+
+
+def notify_user(user_id: int, title: str) -> None:
+    storage.notify(user_id, {"title": title, "timestamp": "Şimdi"})
+    user_cache.pop(user_id)
+    g.pop("current_user", None)
+    announce_notifications()
+
+
+def announce_notifications() -> None:
+    with notification_events:
+        notification_events.notify_all()
 
 
 def find_user_and_account_by_iban(
     iban: str, exclude_user_id: Optional[int] = None
-) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+) -> Tuple[Optional[UserRecord], Optional[Dict[str, Any]]]:
     if not iban:
         return None, None
-    data = load_data()
-    for user in data["users"]:
-        if exclude_user_id and user["id"] == exclude_user_id:
-            continue
-        for account in user.get("accounts", []):
-            if account.get("iban") == iban:
-                return user, account
-    return None, None
+    located = storage.locate_iban(iban)
+    if located is None or (exclude_user_id and located[0] == exclude_user_id):
+        return None, None
+    user_id, position = located
+    user = load_user(user_id)
+    if user is None:
+        return None, None
+    return user, user["accounts"][position]
+
+
+def support_conversation(user: UserRecord) -> Optional[int]:
+    # Chats written before the support store existed sit on the user record; they are
+    # moved into the store the first time they are needed and dropped from the record.
+    conversation_id = support_store.latest_conversation(user.id)
+    if conversation_id is None and user["support_messages"]:
+        conversation_id = support_store.import_messages(user.id, user["support_messages"])
+        user["support_messages"] = []
+        persist_user(user)
+    return conversation_id
+
+
+def parse_history_filters(args: Any) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {}
+    channels = [channel for channel in args.getlist("channel") if channel]
+    unknown = set(channels) - set(TRANSACTION_CHANNELS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen kanal: {', '.join(sorted(unknown))}")
+    if channels:
+        filters["channels"] = channels
+    for key, param in (("date_from", "from"), ("date_to", "to")):
+        value = args.get(param, "").strip()
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"Geçersiz tarih: {value}") from None
+            filters[key] = value
+    return filters
+
+
+def transaction_page(
+    user_id: int,
+    cursor: Optional[int] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+    **filters: Any,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    items = list(storage.transactions(user_id, before=cursor, limit=limit + 1, **filters))
+    next_cursor = items[limit - 1]["id"] if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def render_fragment(user_id: int, section: str, revision: Any, **context: Any) -> Markup:
+    html = fragment_cache.get(user_id, section, revision)
+    if html is None:
+        name = f"fragments/{section}.html"
+        started = time.perf_counter()
+        html = app.jinja_env.get_template(name).render(**context)
+        TEMPLATE_SECONDS.observe((name,), time.perf_counter() - started)
+        fragment_cache.put(user_id, section, revision, html)
+    return Markup(html)
+
+
+def dashboard_fragments(user: UserRecord, billers: List[Dict[str, Any]]) -> Dict[str, Markup]:
+    # A fragment's revision is everything it renders from; the rows are this request's own
+    # copies, so keeping them in the cache cannot alias data someone else is changing.
+    texts = current_texts()
+    language = user.get("language", "tr")
+    accounts, payments, cards = user["accounts"], user["payments"], user["cards"]
+    return {
+        "accounts": render_fragment(user.id, "accounts", accounts, accounts=accounts),
+        "payments": render_fragment(
+            user.id, "payments", (language, payments, billers), payments=payments, billers=billers, texts=texts
+        ),
+        "cards": render_fragment(user.id, "cards", (language, cards), cards=cards, texts=texts),
+    }
 
 
 @app.route("/dashboard")
 @login_required
 def dashboard():
     user = get_current_user()
-    billers = load_data()["billers"]
-    return render_template("dashboard.html", user=user, billers=billers)
+    transactions, next_cursor = transaction_page(user["id"], limit=10)
+    # Only the newest page of notifications is rendered; the page keeps it current through
+    # the long-poll feed below instead of reloading the whole list.
+    notification_cursor, unread = storage.notification_state(user["id"])
+    conversation_id = support_conversation(user)
+    support_messages = (
+        support_store.messages(user.id, conversation_id, limit=SUPPORT_PAGE_SIZE) if conversation_id else []
+    )
+    return render_template(
+        "dashboard.html",
+        user=user,
+        fragments=dashboard_fragments(user, storage.billers()),
+        transactions=transactions,
+        next_cursor=next_cursor,
+        channels=TRANSACTION_CHANNELS,
+        notifications=storage.notifications(user["id"], limit=NOTIFICATION_PAGE_SIZE),
+        notification_page_size=NOTIFICATION_PAGE_SIZE,
+        notification_cursor=notification_cursor,
+        unread_notifications=unread,
+        support_messages=support_messages[::-1],
+        support_conversation=conversation_id,
+        support_cursor=support_messages[-1]["id"] if len(support_messages) == SUPPORT_PAGE_SIZE else None,
+        support_greeting=SUPPORT_GREETING,
+    )
+
+
+@app.route("/api/notifications")
+@login_required
+def notification_feed():
+    user_id = session["user_id"]
+    after = request.args.get("after", type=int)
+    wait = min(max(request.args.get("wait", 0.0, type=float), 0.0), NOTIFICATION_MAX_WAIT)
+    limit = min(max(request.args.get("limit", NOTIFICATION_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    started = time.perf_counter()
+    deadline = time.monotonic() + wait
+    latest, unread = storage.notification_state(user_id)
+    # A single-threaded worker (e.g. gunicorn's sync workers) would be blocked outright by a waiter.
+    parked = (
+        after is not None
+        and latest == after
+        and wait > 0
+        and request.environ.get("wsgi.multithread", False)
+        and notification_waiters.acquire(blocking=False)
+    )
+    if parked:
+        try:
+            while latest == after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                with notification_events:
+                    notification_events.wait(min(remaining, NOTIFICATION_POLL_INTERVAL))
+                latest, unread = storage.notification_state(user_id)
+        finally:
+            notification_waiters.release()
+    g.long_poll_wait = time.perf_counter() - started
+    # A cursor past the newest id means the feed was replaced (demo reset): start over.
+    reset = after is not None and latest < after
+    items = storage.notifications(user_id, after=None if reset else after, limit=limit)
+    retry_after = NOTIFICATION_RETRY_AFTER if not parked and after is not None and latest == after else 0
+    return {"items": items, "cursor": latest, "unread": unread, "reset": reset, "retry_after": retry_after}
+
+
+@app.route("/api/support/conversations")
+@login_required
+def support_conversations():
+    limit = min(max(request.args.get("limit", SUPPORT_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    items = support_store.conversations(session["user_id"], before=request.args.get("cursor", type=int), limit=limit + 1)
+    next_cursor = items[limit - 1]["id"] if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
+
+
+@app.route("/api/support/messages")
+@login_required
+def support_history():
+    # Newest first; without `conversation` the latest thread is used.
+    conversation_id = request.args.get("conversation", type=int) or support_conversation(get_current_user())
+    if conversation_id is None:
+        return {"conversation": None, "items": [], "next_cursor": None}
+    limit = min(max(request.args.get("limit", SUPPORT_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    try:
+        items = support_store.messages(
+            session["user_id"], conversation_id, before=request.args.get("cursor", type=int), limit=limit + 1
+        )
+    except UnknownConversationError:
+        return {"error": "Görüşme bulunamadı."}, 404
+    next_cursor = items[limit - 1]["id"] if len(items) > limit else None
+    return {"conversation": conversation_id, "items": items[:limit], "next_cursor": next_cursor}
+
+
+@app.route("/api/notifications/read", methods=["POST"])
+@login_required
+def read_notifications():
+    user_id = session["user_id"]
+    payload = request.get_json(silent=True) or {}
+    cursor = payload.get("cursor")
+    if not isinstance(cursor, int) or isinstance(cursor, bool) or cursor < 0:
+        return {"error": "Geçersiz imleç."}, 400
+    # Never past the newest id, or notifications still to come would arrive already read.
+    storage.mark_notifications_read(user_id, min(cursor, storage.notification_state(user_id)[0]))
+    return {"unread": storage.notification_state(user_id)[1]}
+
+
+@app.route("/api/transactions")
+@login_required
+def transaction_history():
+    user = get_current_user()
+    iban = request.args.get("account") or None
+    if iban and not any(account["iban"] == iban for account in user["accounts"]):
+        return {"error": "Hesap bulunamadı."}, 404
+    limit = min(max(request.args.get("limit", HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    try:
+        filters = parse_history_filters(request.args)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    items, next_cursor = transaction_page(
+        user["id"], cursor=request.args.get("cursor", type=int), limit=limit, iban=iban, **filters
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def account_analytics(user_id: int, iban: str) -> AccountAnalytics:
+    # Entries only ever extend, so they are kept per history generation: a history replaced
+    # by any worker process (a reset, a rewrite) starts the user's entries over.
+    generation = storage.history_generation(user_id)
+    cached = analytics_cache.get(user_id)
+    if cached is None or cached[0] != generation:
+        cached = (generation, {})
+        analytics_cache.put(user_id, cached)
+    entry = cached[1].setdefault(iban, AccountAnalytics())
+    # Transaction ids only grow, so everything past last_id is exactly what was posted since
+    # the previous read; the first read loads the whole history once.
+    with entry.lock:
+        entry.extend(storage.transactions(user_id, iban=iban, after=entry.last_id or None))
+    return entry
+
+
+def parse_month(value: str) -> Optional[str]:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise ValueError(f"Geçersiz ay: {value}") from None
+    return value
+
+
+@app.route("/api/analytics")
+@login_required
+def analytics():
+    user = get_current_user()
+    iban = request.args.get("account") or (user["accounts"][0]["iban"] if user["accounts"] else None)
+    if not iban or not any(account["iban"] == iban for account in user["accounts"]):
+        return {"error": "Hesap bulunamadı."}, 404
+    try:
+        month_from = parse_month(request.args.get("from", ""))
+        month_to = parse_month(request.args.get("to", ""))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    top = min(max(request.args.get("top", 10, type=int), 1), 100)
+    entry = account_analytics(user["id"], iban)
+    with entry.lock:
+        summary = entry.summary(month_from, month_to, top)
+    return {"account": iban, **summary}
 
 
 @app.route("/biometric", methods=["POST"])
@@ -458,40 +836,77 @@ def complete_kyc():
     return redirect(url_for("dashboard"))
 
 
+def parse_transfer(iban_raw: str, amount_raw: Any) -> Tuple[str, float]:
+    iban = str(iban_raw or "").strip().upper()
+    if not iban.startswith("TR") or len(iban) < 12:
+        raise ValueError("Geçerli bir TR IBAN girin.")
+    try:
+        amount = round(float(str(amount_raw).replace(",", ".")), 2)
+    except ValueError:
+        raise ValueError("Tutar hatalı.") from None
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError("Pozitif bir tutar girin.")
+    return iban, amount
+
+
+def transfer_postings(
+    user: UserRecord,
+    iban: str,
+    located: Optional[Tuple[int, int]],
+    amount: float,
+    description: str,
+    fast: bool,
+    when: str,
+    notify_sender: bool = True,
+) -> List[Posting]:
+    account = user["accounts"][0]
+    trx = {
+        "date": when,
+        "description": description,
+        "amount": -amount,
+        "channel": "FAST" if fast else "Havale",
+        "counterparty": iban,
+    }
+    postings = [
+        Posting(
+            account["iban"],
+            -amount,
+            trx,
+            {"title": f"{amount:.2f} TRY transfer tamamlandı", "timestamp": "Şimdi"} if notify_sender else None,
+        )
+    ]
+    if located:
+        incoming_trx = {
+            "date": trx["date"],
+            "description": f"{user['full_name']} transferi",
+            "amount": amount,
+            "channel": trx["channel"],
+            "counterparty": account["iban"],
+        }
+        if located[0] == user["id"]:
+            notification = {"title": "Hesaplar arası transfer tamamlandı", "timestamp": "Şimdi"}
+        else:
+            notification = {"title": f"{amount:.2f} TRY transfer alındı", "timestamp": "Şimdi"}
+        postings.append(Posting(iban, amount, incoming_trx, notification))
+    return postings
+
+
 @app.route("/transfer", methods=["POST"])
 @login_required
 def transfer():
     user = get_current_user()
-    iban = request.form.get("iban", "").strip().upper()
-    amount_raw = request.form.get("amount", "0").replace(",", ".")
     description = request.form.get("description", "").strip() or "IBAN transferi"
     fast = bool(request.form.get("fast"))
-    if not iban.startswith("TR") or len(iban) < 12:
-        flash("Geçerli bir TR IBAN girin.", "danger")
-        return redirect(url_for("dashboard"))
     try:
-        amount = round(float(amount_raw), 2)
-    except ValueError:
-        flash("Tutar hatalı.", "danger")
-        return redirect(url_for("dashboard"))
-    if amount <= 0:
-        flash("Pozitif bir tutar girin.", "danger")
+        iban, amount = parse_transfer(request.form.get("iban", ""), request.form.get("amount", "0"))
+    except ValueError as exc:
+        flash(str(exc), "danger")
         return redirect(url_for("dashboard"))
 
     account = user["accounts"][0]
 
-    recipient_user: Optional[Dict[str, Any]] = None
-    recipient_account: Optional[Dict[str, Any]] = None
-    for acc in user.get("accounts", []):
-        if acc.get("iban") == iban:
-            recipient_user = user
-            recipient_account = acc
-            break
-
-    if recipient_account is None:
-        recipient_user, recipient_account = find_user_and_account_by_iban(iban, exclude_user_id=user["id"])
-
-    if recipient_account and recipient_account.get("iban") == account.get("iban"):
+    located = storage.locate_iban(iban)
+    if located and located == (user["id"], 0):
         flash("Aynı hesaba transfer yapılamaz.", "warning")
         return redirect(url_for("dashboard"))
 
@@ -499,58 +914,137 @@ def transfer():
         flash("Yetersiz bakiye.", "danger")
         return redirect(url_for("dashboard"))
 
-    account["balance"] = round(account["balance"] - amount, 2)
-    trx = {
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "description": description,
-        "amount": -amount,
-        "channel": "FAST" if fast else "Havale",
-        "counterparty": iban,
-    }
-    user["transactions"].insert(0, trx)
-    account["transactions"].insert(0, trx)
-    user["notifications"].insert(0, {"title": f"{amount:.2f} TRY transfer tamamlandı", "timestamp": "Şimdi"})
-    if recipient_account:
-        incoming_trx = {
-            "date": trx["date"],
-            "description": f"{user['full_name']} transferi",
-            "amount": amount,
-            "channel": trx["channel"],
-            "counterparty": account["iban"],
-        }
-        if recipient_user and recipient_user["id"] == user["id"]:
-            recipient_account["balance"] = round(recipient_account.get("balance", 0) + amount, 2)
-            user["transactions"].insert(0, incoming_trx)
-            recipient_account.setdefault("transactions", []).insert(0, incoming_trx)
-            user["notifications"].insert(0, {"title": "Hesaplar arası transfer tamamlandı", "timestamp": "Şimdi"})
-        elif recipient_user:
-            recipient_account["balance"] = round(recipient_account.get("balance", 0) + amount, 2)
-            recipient_user.setdefault("transactions", []).insert(0, incoming_trx)
-            recipient_account.setdefault("transactions", []).insert(0, incoming_trx)
-            recipient_user.setdefault("notifications", []).insert(
-                0,
-                {
-                    "title": f"{amount:.2f} TRY transfer alındı",
-                    "timestamp": "Şimdi",
-                },
-            )
-            persist_user(recipient_user)
-    persist_user(user)
+    postings = transfer_postings(
+        user, iban, located, amount, description, fast, datetime.now().strftime("%Y-%m-%d %H:%M")
+    )
+    try:
+        post_ledger(postings)
+    except InsufficientFundsError:
+        flash("Yetersiz bakiye.", "danger")
+        return redirect(url_for("dashboard"))
     flash("Transfer talimatı kaydedildi.", "success")
     return redirect(url_for("dashboard"))
 
 
+def read_batch_items() -> List[Dict[str, Any]]:
+    # JSON bodies are either a list of items or {"items": [...]}; CSV comes as the request
+    # body (text/csv) or an uploaded "file", with an iban,amount,description,fast header.
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        items = payload.get("items") if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError("Geçersiz JSON: işlem listesi bekleniyor.")
+        return items
+    upload = request.files.get("file")
+    raw = upload.read() if upload is not None else request.get_data()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV dosyası UTF-8 olmalı.") from None
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if rows and rows[0] and rows[0][0].strip().lower() == "iban":
+        header = [cell.strip().lower() for cell in rows[0]]
+        rows = rows[1:]
+    else:
+        header = list(BATCH_TRANSFER_FIELDS)
+    return [dict(zip(header, row)) for row in rows]
+
+
+@app.route("/transfer/batch", methods=["POST"])
+@login_required
+def transfer_batch():
+    started = time.perf_counter()
+    user = get_current_user()
+    try:
+        items = read_batch_items()
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    if not items:
+        return {"error": "Transfer listesi boş."}, 400
+    if len(items) > BATCH_TRANSFER_LIMIT:
+        return {"error": f"Bir seferde en fazla {BATCH_TRANSFER_LIMIT} transfer gönderilebilir."}, 400
+
+    results: List[Dict[str, Any]] = []
+    parsed: List[Tuple[str, float, str, bool]] = []
+    for index, item in enumerate(items):
+        try:
+            iban, amount = parse_transfer(item.get("iban", ""), item.get("amount", "0"))
+        except ValueError as exc:
+            results.append({"index": index, "iban": item.get("iban"), "status": "error", "error": str(exc)})
+            continue
+        description = str(item.get("description") or "").strip() or "IBAN transferi"
+        fast = item.get("fast")
+        if isinstance(fast, str):
+            fast = fast.strip().lower() in ("1", "true", "evet", "yes", "on", "fast")
+        parsed.append((iban, amount, description, bool(fast)))
+        results.append({"index": index, "iban": iban, "amount": amount, "status": "ok"})
+
+    # One lookup for every distinct recipient instead of one per row.
+    located = storage.locate_ibans({iban for iban, _, _, _ in parsed})
+    own_account = (user["id"], 0)
+    for result in results:
+        if result["status"] == "ok" and located[result["iban"]] == own_account:
+            result.update(status="error", error="Aynı hesaba transfer yapılamaz.")
+    total = round(sum(result["amount"] for result in results if result["status"] == "ok"), 2)
+    errors = sum(1 for result in results if result["status"] == "error")
+    if not errors and user["accounts"][0]["balance"] < total:
+        return {"error": "Yetersiz bakiye.", "total": total, "items": results}, 409
+    if errors:
+        # The batch is all-or-nothing: nothing is posted until every row is valid.
+        for result in results:
+            if result["status"] == "ok":
+                result["status"] = "skipped"
+        return {"error": f"{errors} satır hatalı, hiçbir transfer yapılmadı.", "items": results}, 400
+
+    when = datetime.now().strftime("%Y-%m-%d %H:%M")
+    postings: List[Posting] = []
+    for (iban, amount, description, fast), result in zip(parsed, results):
+        result["internal"] = located[iban] is not None
+        postings.extend(transfer_postings(user, iban, located[iban], amount, description, fast, when, notify_sender=False))
+    # The sender gets one summary instead of a notification per row.
+    postings[0] = dataclasses.replace(
+        postings[0], notification={"title": f"{len(parsed)} transfer tamamlandı ({total:.2f} TRY)", "timestamp": "Şimdi"}
+    )
+    try:
+        post_ledger(postings)
+    except InsufficientFundsError:
+        return {"error": "Yetersiz bakiye.", "total": total, "items": results}, 409
+    elapsed = time.perf_counter() - started
+    return {
+        "items": results,
+        "count": len(parsed),
+        "total": total,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "transfers_per_second": round(len(parsed) / elapsed, 1) if elapsed else None,
+    }
+
+
 @app.route("/qr-prefill", methods=["POST"])
 @login_required
 def qr_prefill():
     qr_data = request.json.get("qr", "") if request.is_json else request.form.get("qr", "")
-    result = {"payee": "", "amount": "", "iban": ""}
-    if qr_data:
-        parts = {segment.split("=", 1)[0]: segment.split("=", 1)[1] for segment in qr_data.split("|") if "=" in segment}
-        result["payee"] = parts.get("PAYEE", "")
-        result["amount"] = parts.get("AMT", "")
-        result["iban"] = parts.get("IBAN", parts.get("ACC", ""))
-    return result
+    if not qr_data.strip():
+        return {"payee": "", "amount": "", "iban": ""}
+    try:
+        return decode_qr(qr_data)
+    except QRDecodeError as exc:
+        return {"payee": "", "amount": "", "iban": "", "error": str(exc)}, 400
+
+
+def pay_bill(user: UserRecord, biller: str, customer_no: str, amount: float, title: str) -> None:
+    account = user["accounts"][0]
+    if not math.isfinite(amount) or amount <= 0:
+        raise InvalidAmountError(account["iban"])
+    if account["balance"] < amount:
+        raise InsufficientFundsError(account["iban"])
+    trx = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "description": f"{biller} ödemesi",
+        "amount": -amount,
+        "channel": "Ödeme",
+        "counterparty": customer_no or biller,
+    }
+    post_ledger([Posting(account["iban"], -amount, trx, {"title": title, "timestamp": "Şimdi"})])
 
 
 @app.route("/pay", methods=["POST"])
@@ -566,33 +1060,91 @@ def pay_biller():
     except ValueError:
         flash("Tutar hatalı.", "danger")
         return redirect(url_for("dashboard"))
-    account = user["accounts"][0]
-    if account["balance"] < amount:
+    if not math.isfinite(amount) or amount <= 0:
+        flash("Pozitif bir tutar girin.", "danger")
+        return redirect(url_for("dashboard"))
+    try:
+        pay_bill(user, biller, customer_no, amount, f"{biller} ödemesi yapıldı")
+    except InsufficientFundsError:
         flash("Yetersiz bakiye.", "danger")
         return redirect(url_for("dashboard"))
-    account["balance"] = round(account["balance"] - amount, 2)
-    trx = {
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "description": f"{biller} ödemesi",
-        "amount": -amount,
-        "channel": "Ödeme",
-        "counterparty": customer_no or biller,
-    }
-    user["transactions"].insert(0, trx)
-    account["transactions"].insert(0, trx)
+    # The amount and date are kept so autopay knows what to pay and when it last ran.
+    paid = {"autopay": autopay, "amount": amount, "last_paid": datetime.now().strftime("%Y-%m-%d")}
     existing = next((p for p in user["payments"] if p["biller"] == biller and p["customer_no"] == customer_no), None)
     if existing:
-        existing["autopay"] = autopay
+        existing.update(paid)
     else:
-        user["payments"].append(
-            {"biller": biller, "subscriber": biller, "customer_no": customer_no, "autopay": autopay}
-        )
-    user["notifications"].insert(0, {"title": f"{biller} ödemesi yapıldı", "timestamp": "Şimdi"})
+        user["payments"].append({"biller": biller, "subscriber": biller, "customer_no": customer_no, **paid})
     persist_user(user)
     flash("Ödeme işlendi.", "success")
     return redirect(url_for("dashboard"))
 
 
+def collect_autopays() -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # The key names the billing month, so each instruction is queued at most once per month
+    # no matter how often collection runs or how many processes run it.
+    month = datetime.now().strftime("%Y-%m")
+    for user_id, _, payment in storage.due_autopays(month):
+        key = f"{user_id}:{payment['biller']}:{payment['customer_no']}:{month}"
+        yield key, {
+            "user_id": user_id,
+            "biller": payment["biller"],
+            "customer_no": payment["customer_no"],
+            "amount": payment["amount"],
+            "month": month,
+        }
+
+
+def execute_autopay(payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    user = load_user(payload["user_id"])
+    if user is None:
+        return "skipped", {"reason": "Kullanıcı bulunamadı."}
+    biller, customer_no, amount = payload["biller"], payload["customer_no"], payload["amount"]
+    payment = next((p for p in user["payments"] if p["biller"] == biller and p["customer_no"] == customer_no), None)
+    if payment is None or not payment.get("autopay"):
+        return "skipped", {"reason": "Otomatik ödeme talimatı kaldırılmış."}
+    if (payment.get("last_paid") or "")[:7] >= payload["month"]:
+        return "skipped", {"reason": "Bu dönem zaten ödenmiş."}
+    try:
+        pay_bill(user, biller, customer_no, amount, f"Otomatik ödeme: {biller} ({amount:.2f} TRY)")
+    except InsufficientFundsError:
+        notify_user(user.id, f"Otomatik ödeme yapılamadı: {biller} (yetersiz bakiye)")
+        return "failed", {"error": "Yetersiz bakiye.", "amount": amount}
+    except InvalidAmountError:
+        # Instructions saved before amounts were validated can carry a negative or zero amount.
+        return "failed", {"error": "Geçersiz tutar.", "amount": amount}
+    payment["last_paid"] = datetime.now().strftime("%Y-%m-%d")
+    persist_user(user)
+    return "done", {"amount": amount, "paid_at": payment["last_paid"]}
+
+
+def execute_autopays(jobs: List[Job]) -> List[JobResult]:
+    # Each job stands alone: one that raises is recorded as failed while the ones before it,
+    # which may already have debited money, keep their own results.
+    results: List[JobResult] = []
+    with app.app_context():
+        for job in jobs:
+            try:
+                results.append((job.id, *execute_autopay(job.payload)))
+            except Exception as exc:
+                app.logger.exception("autopay job %s failed", job.id)
+                results.append((job.id, "failed", {"error": str(exc)}))
+    return results
+
+
+autopay_runner = JobRunner(
+    job_queue,
+    "autopay",
+    collect_autopays,
+    execute_autopays,
+    workers=int(os.environ.get("ALTERNATIF_BANK_AUTOPAY_WORKERS", 2)),
+    batch_size=int(os.environ.get("ALTERNATIF_BANK_AUTOPAY_BATCH", 50)),
+    interval=AUTOPAY_INTERVAL or 60.0,
+)
+if AUTOPAY_INTERVAL:
+    autopay_runner.start()
+
+
 @app.route("/card/<card_id>/freeze", methods=["POST"])
 @login_required
 def toggle_card(card_id: str):
@@ -632,15 +1184,19 @@ def support():
         flash("Mesaj boş olamaz.", "danger")
         return redirect(url_for("dashboard"))
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    user["support_messages"].append({"sender": "user", "message": message, "timestamp": timestamp})
-    user["support_messages"].append(
-        {
-            "sender": "agent",
-            "message": "Talebinizi aldık, en kısa sürede dönüş yapacağız.",
-            "timestamp": timestamp,
-        }
-    )
-    persist_user(user)
+    support_conversation(user)
+    try:
+        support_store.post(
+            user.id,
+            [
+                {"sender": "user", "message": message, "timestamp": timestamp},
+                {"sender": "agent", "message": "Talebinizi aldık, en kısa sürede dönüş yapacağız.", "timestamp": timestamp},
+            ],
+            conversation_id=request.form.get("conversation", type=int),
+        )
+    except UnknownConversationError:
+        flash("Görüşme bulunamadı.", "danger")
+        return redirect(url_for("dashboard"))
     flash("Destek talebiniz iletildi.", "success")
     return redirect(url_for("dashboard"))
 
@@ -661,53 +1217,98 @@ def settings():
 @login_required
 def reset_demo():
     user = get_current_user()
-    data = load_data()
-    existing_ibans = {
-        account["iban"]
-        for usr in data["users"]
-        if usr["id"] != user["id"]
-        for account in usr.get("accounts", [])
-        if account.get("iban")
-    }
     rebuilt = build_default_user(
-        user["full_name"], user["contact"], user["contact_type"], existing_ibans
+        user["full_name"], user["contact"], user["contact_type"], storage.iban_exists
     )
     rebuilt["id"] = user["id"]
-    for idx, existing in enumerate(data["users"]):
-        if existing["id"] == user["id"]:
-            data["users"][idx] = rebuilt
-            save_data(data)
-            flash("Demo verileri sıfırlandı.", "success")
-            break
+    storage.replace_user(rebuilt)
+    user_cache.pop(rebuilt["id"])
+    statement_cache.invalidate_user(rebuilt["id"])
+    analytics_cache.pop(rebuilt["id"])
+    support_store.delete_user(rebuilt["id"])
+    fragment_cache.invalidate(rebuilt["id"], FRAGMENT_SECTIONS)
+    g.pop("current_user", None)
+    flash("Demo verileri sıfırlandı.", "success")
     return redirect(url_for("dashboard"))
 
 
+def statement_etag(user_id: int, fmt: str, filters: Dict[str, Any]) -> str:
+    # The history revision changes on every append to the user's accounts, so the tag
+    # identifies the rendered bytes without hashing them. A reset can bring the revision back
+    # to an earlier value (SQLite reuses freed row ids), so the history generation goes in too.
+    key = {
+        "user": user_id,
+        "format": fmt,
+        "filters": {name: sorted(value) if isinstance(value, list) else value for name, value in filters.items()},
+        "revision": storage.history_revision(user_id),
+        "generation": storage.history_generation(user_id),
+        "compress": app.config["STATEMENT_PDF_COMPRESS"] if fmt == "pdf" else None,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
 @app.route("/export/<fmt>")
 @login_required
 def export(fmt: str):
     user = get_current_user()
-    if fmt == "csv":
-        buffer = io.StringIO()
-        buffer.write("date,description,amount,channel,counterparty\n")
-        for trx in user["transactions"][:20]:
-            buffer.write(
-                f"{trx['date']},{trx['description']},{trx['amount']},{trx['channel']},{trx['counterparty']}\n"
-            )
-        csv_data = buffer.getvalue()
-        return Response(
-            csv_data,
-            mimetype="text/csv",
-            headers={"Content-Disposition": "attachment; filename=statement.csv"},
-        )
-    if fmt == "pdf":
-        pdf_bytes = build_statement_pdf(user["transactions"])
-        return Response(
-            pdf_bytes,
-            mimetype="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=statement.pdf"},
+    if fmt not in ("csv", "pdf"):
+        flash("Desteklenmeyen format.", "danger")
+        return redirect(url_for("dashboard"))
+    try:
+        filters = parse_history_filters(request.args)
+    except ValueError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("dashboard"))
+    etag = statement_etag(user["id"], fmt, filters)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = statement_cache.get(user["id"], etag)
+        if body is None:
+            transactions = storage.transactions(user["id"], **filters)
+            if fmt == "csv":
+                chunks = (chunk.encode("utf-8") for chunk in iter_statement_csv(transactions))
+            else:
+                chunks = iter_statement_pdf(transactions, compress=app.config["STATEMENT_PDF_COMPRESS"])
+            body = statement_cache.capture(user["id"], etag, chunks)
+        response = Response(
+            body,
+            mimetype="text/csv" if fmt == "csv" else "application/pdf",
+            headers={"Content-Disposition": f"attachment; filename=statement.{fmt}"},
         )
-    flash("Desteklenmeyen format.", "danger")
-    return redirect(url_for("dashboard"))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.cli.command("run-autopay")
+def run_autopays() -> None:
+    totals = autopay_runner.run_once()
+    if not totals:
+        click.echo("Vadesi gelen otomatik ödeme yok.")
+    for state, count in sorted(totals.items()):
+        click.echo(f"{state}: {count}")
+
+
+@app.cli.command("archive-support")
+@click.option("--days", type=float, default=None, help="Bu kadar gündür sessiz görüşmeleri arşivle.")
+def archive_support(days: Optional[float]) -> None:
+    archived = support_store.archive(days * 24 * 3600 if days is not None else None)
+    click.echo(f"{archived} destek görüşmesi arşivlendi.")
+
+
+@app.cli.command("migrate-storage")
+@click.argument("db_path", type=click.Path(dir_okay=False))
+@click.option("--source", type=click.Path(exists=True, dir_okay=False), default=str(DATA_PATH))
+def migrate_storage(db_path: str, source: str) -> None:
+    migrated = migrate_json_to_sqlite(source, db_path)
+    click.echo(f"{migrated} kullanıcı {db_path} dosyasına taşındı.")
 
 
 if __name__ == "__main__":
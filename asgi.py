@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app import app, storage
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+# Blocking work (storage, template rendering, export generation) runs on this many threads;
+# connections waiting on the network or idling in keep-alive only cost a coroutine.
+ASGI_THREADS = int(os.environ.get("ALTERNATIF_BANK_ASGI_THREADS", 32))
+# Worker processes share the storage files; JsonStorage coordinates them with file locks.
+ASGI_WORKERS = int(os.environ.get("ALTERNATIF_BANK_WORKERS", 1))
+ASGI_MAX_BODY = int(os.environ.get("ALTERNATIF_BANK_ASGI_MAX_BODY", 16 * 1024 * 1024))
+# Streamed responses (exports) are coalesced into chunks of this size per event-loop hop.
+ASGI_CHUNK_BYTES = 64 * 1024
+
+
+def build_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        # The whole body is buffered, so chunked uploads without Content-Length read fine.
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": ASGI_WORKERS > 1,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name, value = raw_name.decode("latin-1").upper().replace("-", "_"), raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsgiAdapter:
+    # Serves a WSGI app over ASGI. Each request runs start to finish on one pool thread, so
+    # per-thread state (SQLite connections, open journal handles) stays valid while a
+    # streamed export is iterated; the thread hands chunks to the event loop and waits for
+    # the send to complete, which gives slow clients natural backpressure.
+    def __init__(self, wsgi_app: Callable[..., Iterable[bytes]], threads: int = ASGI_THREADS) -> None:
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-worker")
+        self.on_shutdown: List[Callable[[], None]] = []
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # In-flight requests finish first; then storage flushes its pending checkpoint.
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+        for callback in self.on_shutdown:
+            callback()
+
+    async def http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await self.read_body(receive)
+        if body is None:
+            await send_plain(send, 413, b"Request body too large")
+            return
+        disconnected = threading.Event()
+        watcher = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.run, build_environ(scope, body), send, loop, disconnected)
+        finally:
+            watcher.cancel()
+
+    async def read_body(self, receive: Receive) -> Optional[bytes]:
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > ASGI_MAX_BODY:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    def run(self, environ: Dict[str, Any], send: Send, loop: asyncio.AbstractEventLoop, disconnected: threading.Event) -> None:
+        response: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> Callable[[bytes], None]:
+            if exc_info and response.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+            return lambda data: emit(data, True)
+
+        def deliver(message: Message) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def emit(data: bytes, more: bool) -> None:
+            if not response.get("sent"):
+                response["sent"] = True
+                deliver({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            deliver({"type": "http.response.body", "body": data, "more_body": more})
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            pending: List[bytes] = []
+            size = 0
+            for chunk in result:
+                if disconnected.is_set():
+                    # Nobody is reading any more; stop generating the rest of the export.
+                    return
+                if not chunk:
+                    continue
+                pending.append(chunk)
+                size += len(chunk)
+                if size >= ASGI_CHUNK_BYTES:
+                    emit(b"".join(pending), True)
+                    pending, size = [], 0
+            emit(b"".join(pending), False)
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+
+async def watch_disconnect(receive: Receive, disconnected: threading.Event) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    disconnected.set()
+
+
+async def send_plain(send: Send, status: int, body: bytes) -> None:
+    headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode("ascii"))]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+application = AsgiAdapter(app)
+if hasattr(storage, "close"):
+    application.on_shutdown.append(storage.close)
+
+
+def main() -> None:
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("ASGI modu için uvicorn gerekli: pip install uvicorn") from None
+    uvicorn.run(
+        # Several workers means uvicorn imports the app itself in each process.
+        "asgi:application" if ASGI_WORKERS > 1 else application,
+        workers=ASGI_WORKERS,
+        host=os.environ.get("ALTERNATIF_BANK_HOST", "127.0.0.1"),
+        port=int(os.environ.get("ALTERNATIF_BANK_PORT", 8000)),
+        # Beyond this many open connections new ones get 503 instead of queueing unboundedly.
+        limit_concurrency=int(os.environ.get("ALTERNATIF_BANK_MAX_CONNECTIONS", 2048)),
+        backlog=int(os.environ.get("ALTERNATIF_BANK_BACKLOG", 2048)),
+        timeout_keep_alive=int(os.environ.get("ALTERNATIF_BANK_KEEPALIVE", 15)),
+        lifespan="on",
+        log_level=os.environ.get("ALTERNATIF_BANK_LOG_LEVEL", "info"),
+    )
+
+
+if __name__ == "__main__":
+    main()
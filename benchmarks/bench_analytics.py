@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from analytics import ANALYTICS_BACKEND, AccountAnalytics
+
+CHANNELS = ("FAST", "EFT", "Kart", "Fatura", "Havale")
+
+
+def synthesize(count: int, counterparties: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": index + 1,
+            "date": f"{2020 + index * 5 // count}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "amount": round(rng.uniform(-2000, 1500), 2),
+            "channel": rng.choice(CHANNELS),
+            "counterparty": f"Karşı taraf {rng.randrange(counterparties)}",
+        }
+        for index in range(count)
+    ]
+
+
+def naive(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[float]]]:
+    # What a per-request recompute looks like: one dict lookup per row and dimension.
+    groups: Dict[str, Dict[str, List[float]]] = {"month": defaultdict(lambda: [0.0, 0.0, 0])}
+    groups["channel"] = defaultdict(lambda: [0.0, 0.0, 0])
+    groups["counterparty"] = defaultdict(lambda: [0.0, 0.0, 0])
+    for row in rows:
+        for dimension, key in (("month", row["date"][:7]), ("channel", row["channel"]), ("counterparty", row["counterparty"])):
+            totals = groups[dimension][key]
+            totals[0 if row["amount"] < 0 else 1] += abs(row["amount"])
+            totals[2] += 1
+    return groups
+
+
+def timed(func: Any, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Grouped transaction aggregates: columnar vs per-row")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--counterparties", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rows = synthesize(args.rows, args.counterparties, args.seed)
+    history, fresh = rows[:-1], rows[-1:]
+
+    entry = AccountAnalytics()
+    load = timed(lambda: entry.extend(history))
+    incremental = timed(lambda: entry.extend(fresh))
+    summary = timed(entry.summary, 20)
+    filtered = timed(lambda: entry.summary("2022-01", "2022-12"), 5)
+    recompute = timed(lambda: naive(rows), 3)
+
+    print(f"engine: {ANALYTICS_BACKEND}, rows: {args.rows}")
+    print(f"{'initial load':>24} {load:>10.2f} ms")
+    print(f"{'incremental (1 row)':>24} {incremental:>10.3f} ms")
+    print(f"{'cached summary':>24} {summary:>10.3f} ms")
+    print(f"{'month-range summary':>24} {filtered:>10.2f} ms")
+    print(f"{'per-row recompute':>24} {recompute:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
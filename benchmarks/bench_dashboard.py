@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.bench_routes import login, percentile, synthesize
+
+# /dashboard rendered with and without the fragment cache. "read" only reloads the page;
+# "mixed" posts a transfer before a share of the loads, so the accounts fragment keeps
+# being invalidated the way it is in real use. Render time is what the template histogram
+# saw per page load, fragments and the page itself together.
+
+
+def render_seconds(app_module: Any) -> float:
+    names = ["dashboard.html"] + [f"fragments/{section}.html" for section in app_module.FRAGMENT_SECTIONS]
+    return sum(app_module.TEMPLATE_SECONDS.total((name,)) for name in names)
+
+
+def run(
+    app_module: Any, clients: List[Any], people: List[Dict[str, Any]], loads: int, churn: float, seed: int
+) -> Dict[str, float]:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    rendered = render_seconds(app_module)
+    for _ in range(loads):
+        client = rng.choice(clients)
+        if rng.random() < churn:
+            client.post(
+                "/transfer",
+                data={"iban": rng.choice(people)["iban"], "amount": "1", "description": "Benchmark", "fast": "1"},
+            )
+        started = time.perf_counter()
+        response = client.get("/dashboard")
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+    return {
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "render_ms": (render_seconds(app_module) - rendered) / loads * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Dashboard render time with and without the fragment cache")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--accounts", type=int, default=4, help="accounts per user")
+    parser.add_argument("--depth", type=int, default=20, help="extra transactions per user")
+    parser.add_argument("--loads", type=int, default=1000, help="dashboard loads per run")
+    parser.add_argument("--churn", type=float, default=0.2, help="share of loads preceded by a transfer in the mixed run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="alternatif-dashboard-"))
+    os.environ["ALTERNATIF_BANK_STORAGE"] = str(workdir / ("bench.db" if args.backend == "sqlite" else "bench.json"))
+    app_module = importlib.import_module("app")
+    app_module.app.config["TESTING"] = True
+    people = synthesize(app_module, args.users, args.accounts, args.depth, args.seed)
+    clients = []
+    for person in people:
+        client = app_module.app.test_client()
+        login(client, person["contact"])
+        clients.append(client)
+
+    print(f"{args.users} users × {args.accounts} accounts ({args.backend}), {args.loads} loads per run")
+    print(f"{'workload':<9} {'cache':<6} {'p50 ms':>8} {'p95 ms':>8} {'render ms':>10} {'hit rate':>9}")
+    for workload, churn in (("read", 0.0), ("mixed", args.churn)):
+        for label, maxsize in (("off", 0), ("on", 4096)):
+            cache = app_module.FragmentCache(maxsize=maxsize)
+            app_module.fragment_cache = cache
+            # One untimed pass so both runs start with warm templates and a filled cache.
+            run(app_module, clients, people, len(clients), 0.0, args.seed)
+            cache.hits = cache.misses = 0
+            result = run(app_module, clients, people, args.loads, churn, args.seed)
+            lookups = cache.hits + cache.misses
+            hit_rate = f"{cache.hits / lookups * 100:.0f}%" if lookups else "-"
+            print(
+                f"{workload:<9} {label:<6} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+                f" {result['render_ms']:>10.3f} {hit_rate:>9}"
+                + (f"  ({result['errors']} errors)" if result["errors"] else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
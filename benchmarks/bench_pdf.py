@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator
+
+from statements import LINES_PER_PAGE, iter_statement_pdf
+
+
+def synthetic_transactions(count: int) -> Iterator[Dict[str, Any]]:
+    for index in range(count):
+        yield {
+            "date": f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d} 10:{index % 60:02d}",
+            "description": f"Market harcaması #{index}",
+            "amount": -round(10 + index % 500 * 1.37, 2),
+            "channel": "Kart",
+            "counterparty": "Migros",
+        }
+
+
+def consume(rows: int, compress: bool) -> int:
+    return sum(len(chunk) for chunk in iter_statement_pdf(synthetic_transactions(rows), compress=compress))
+
+
+def run(rows: int, compress: bool) -> Dict[str, float]:
+    # Timing and memory are measured in separate passes because tracemalloc slows the writer down.
+    started = time.perf_counter()
+    size = consume(rows, compress)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    consume(rows, compress)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pages = -(-(rows + 2) // LINES_PER_PAGE)
+    return {
+        "rows": rows,
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed,
+        "bytes": size,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming PDF statement throughput")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    print(f"{'rows':>8} {'flate':>5} {'pages':>6} {'pages/s':>9} {'MiB out':>8} {'peak KiB':>9}")
+    for rows in args.rows:
+        for compress in (False, True):
+            result = run(rows, compress)
+            print(
+                f"{result['rows']:>8} {'on' if compress else 'off':>5} {result['pages']:>6}"
+                f" {result['pages_per_sec']:>9.0f} {result['bytes'] / 2**20:>8.2f} {result['peak_kib']:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
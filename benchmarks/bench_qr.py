@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from qr import decode_qr, encode_karekod, qr_cache
+
+IBAN = "TR330006100519786457841326"
+
+
+def legacy_decode(payload: str) -> Dict[str, str]:
+    # The parser qr_prefill used before qr.py, kept for comparison (pipe key=value only).
+    parts = {segment.split("=", 1)[0]: segment.split("=", 1)[1] for segment in payload.split("|") if "=" in segment}
+    return {"payee": parts.get("PAYEE", ""), "amount": parts.get("AMT", ""), "iban": parts.get("IBAN", parts.get("ACC", ""))}
+
+
+def payloads(fmt: str, count: int) -> List[str]:
+    # Distinct amounts keep every payload unique, so "cold" runs never hit the cache.
+    if fmt == "emv":
+        return [encode_karekod(IBAN, 100 + index / 100, "Ali Yılmaz", "İstanbul", f"R{index}") for index in range(count)]
+    if fmt == "json":
+        return [json.dumps({"iban": IBAN, "amount": 100 + index / 100, "name": "Ali Yılmaz"}) for index in range(count)]
+    if fmt == "positional":
+        return [f"{IBAN}|{100 + index / 100}|Ali Yılmaz" for index in range(count)]
+    return [f"TRQR|PAYEE=Ali Yılmaz|AMT={100 + index / 100}|IBAN={IBAN}" for index in range(count)]
+
+
+def rate(decode: Callable[[str], Dict[str, str]], batch: List[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for payload in batch:
+            decode(payload)
+    return len(batch) * repeat / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="QR payload decodes per second")
+    parser.add_argument("--payloads", type=int, default=20_000)
+    args = parser.parse_args()
+    print(f"{'format':>10} {'legacy/s':>10} {'cold/s':>10} {'repeat/s':>10}")
+    for fmt in ("key_value", "positional", "json", "emv"):
+        batch = payloads(fmt, args.payloads)
+        legacy = f"{rate(legacy_decode, batch, 1):>10.0f}" if fmt == "key_value" else f"{'-':>10}"
+        qr_cache.clear()
+        cold = rate(decode_qr, batch, 1)
+        # A small working set that fits the LRU measures the repeat-scan case.
+        hot = batch[: min(len(batch), qr_cache.maxsize)]
+        repeat = rate(decode_qr, hot, max(1, args.payloads // len(hot)))
+        print(f"{fmt:>10} {legacy} {cold:>10.0f} {repeat:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
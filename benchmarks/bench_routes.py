@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ROUTES = ("login", "dashboard", "api_transactions", "transfer", "pay_biller", "export_csv", "export_pdf")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is a process-wide high-water mark (KiB on Linux), not the current size.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def synthesize(app_module: Any, users: int, accounts: int, depth: int, seed: int) -> List[Dict[str, Any]]:
+    # Users come from build_default_user so the dataset has the same shape as real sign-ups;
+    # extra accounts and history depth are layered on top.
+    rng = random.Random(seed)
+    random.seed(seed)
+    taken: Set[str] = set()
+    minted: Set[str] = set()
+    built = []
+    start = datetime(2024, 1, 1)
+    for user_id in range(1, users + 1):
+        user = app_module.build_default_user(
+            f"Kullanıcı {user_id}", f"user{user_id}@example.com", "email", taken.__contains__
+        )
+        user["id"] = user_id
+        for extra in range(accounts - len(user["accounts"])):
+            user["accounts"].append(
+                {
+                    "name": f"Ek Hesap {extra + 1}",
+                    "iban": app_module.generate_mock_iban(taken.__contains__, minted),
+                    "balance": 1000.0,
+                    "transactions": [],
+                }
+            )
+        for account in user["accounts"]:
+            taken.add(account["iban"])
+        history = user["accounts"][0]["transactions"]
+        for index in range(depth):
+            amount = round(rng.uniform(5, 500), 2)
+            history.insert(
+                0,
+                {
+                    "date": (start + timedelta(minutes=index * 37)).strftime("%Y-%m-%d %H:%M"),
+                    "description": f"Sentetik işlem #{index}",
+                    "amount": -amount if index % 3 else amount,
+                    "channel": app_module.TRANSACTION_CHANNELS[index % len(app_module.TRANSACTION_CHANNELS)],
+                    "counterparty": "Benchmark",
+                },
+            )
+        user["accounts"][0]["balance"] = 1_000_000.0
+        built.append(user)
+    app_module.storage.save_data(
+        {"next_user_id": users + 1, "users": built, "billers": app_module.storage.billers()}
+    )
+    return [{"contact": user["contact"], "iban": user["accounts"][0]["iban"]} for user in built]
+
+
+def login(client: Any, contact: str) -> None:
+    client.post("/login", data={"contact": contact})
+    response = client.post("/verify", data={"otp": "123456"})
+    if response.status_code != 302 or "/dashboard" not in response.location:
+        raise RuntimeError(f"login failed for {contact}")
+
+
+def route_request(route: str, rng: random.Random, people: List[Dict[str, Any]]) -> Callable[[Any], Any]:
+    if route == "dashboard":
+        return lambda client: client.get("/dashboard")
+    if route == "api_transactions":
+        return lambda client: client.get("/api/transactions?limit=50")
+    if route == "transfer":
+        return lambda client: client.post(
+            "/transfer",
+            data={"iban": rng.choice(people)["iban"], "amount": "1", "description": "Benchmark", "fast": "1"},
+        )
+    if route == "pay_biller":
+        return lambda client: client.post(
+            "/pay", data={"biller": "Elektrik", "customer_no": "21900345", "bill_amount": "1"}
+        )
+    if route == "export_csv":
+        return lambda client: client.get("/export/csv").get_data()
+    if route == "export_pdf":
+        return lambda client: client.get("/export/pdf").get_data()
+    raise ValueError(route)
+
+
+def run_route(
+    app_module: Any, route: str, people: List[Dict[str, Any]], requests: int, threads: int, seed: int
+) -> Dict[str, float]:
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        share = requests // threads + (1 if index < requests % threads else 0)
+        client = app_module.app.test_client()
+        if route != "login":
+            login(client, people[index % len(people)]["contact"])
+            send = route_request(route, rng, people)
+        barrier.wait()
+        for _ in range(share):
+            started = time.perf_counter()
+            try:
+                if route == "login":
+                    login(app_module.app.test_client(), rng.choice(people)["contact"])
+                else:
+                    response = send(client)
+                    if getattr(response, "status_code", 200) >= 400:
+                        errors[index] += 1
+            except Exception:
+                errors[index] += 1
+            latencies[index].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    with RssSampler() as sampler:
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    samples = [latency for bucket in latencies for latency in bucket]
+    return {
+        "requests": len(samples),
+        "errors": sum(errors),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "peak_rss_mib": sampler.peak / 2**20,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    regressed = False
+    print(f"\n{'route':<17} {'p95 ms':>17} {'Δ':>7} {'req/s':>17} {'Δ':>7}")
+    for route, result in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if before is None:
+            continue
+        p95_delta = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        rps_delta = (result["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        flag = p95_delta > tolerance or rps_delta < -tolerance
+        regressed = regressed or flag
+        print(
+            f"{route:<17} {before['p95_ms']:>8.2f}→{result['p95_ms']:<8.2f} {p95_delta:>+6.1f}%"
+            f" {before['rps']:>8.1f}→{result['rps']:<8.1f} {rps_delta:>+6.1f}%{'  REGRESSION' if flag else ''}"
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency/throughput of the Flask routes on a synthetic dataset")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--accounts", type=int, default=2, help="accounts per user")
+    parser.add_argument("--depth", type=int, default=100, help="extra transactions per user")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="where to save the results (JSON)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="alternatif-bench-"))
+    os.environ["ALTERNATIF_BANK_STORAGE"] = str(workdir / ("bench.db" if args.backend == "sqlite" else "bench.json"))
+    app_module = importlib.import_module("app")
+    app_module.app.config["TESTING"] = True
+
+    started = time.perf_counter()
+    people = synthesize(app_module, args.users, args.accounts, args.depth, args.seed)
+    print(
+        f"{args.users} users × {args.accounts} accounts, +{args.depth} transactions each"
+        f" ({args.backend}, {time.perf_counter() - started:.1f}s to build), {args.threads} thread(s)"
+    )
+    print(f"{'route':<17} {'req':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'RSS MiB':>8}")
+    results: Dict[str, Any] = {
+        "meta": {
+            "backend": args.backend,
+            "users": args.users,
+            "accounts": args.accounts,
+            "depth": args.depth,
+            "requests": args.requests,
+            "threads": args.threads,
+            "python": platform.python_version(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+        },
+        "routes": {},
+    }
+    for route in args.routes:
+        result = run_route(app_module, route, people, args.requests, args.threads, args.seed)
+        results["routes"][route] = result
+        print(
+            f"{route:<17} {result['requests']:>5} {result['errors']:>4} {result['p50_ms']:>8.2f}"
+            f" {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['rps']:>8.1f} {result['peak_rss_mib']:>8.1f}"
+        )
+
+    output: Optional[Path] = args.output
+    if output is None:
+        output = RESULTS_DIR / f"routes-{args.backend}-{args.users}u-{args.threads}t.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nsaved {output}")
+    if args.compare and compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
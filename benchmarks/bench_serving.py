@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from http.cookiejar import CookieJar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import HTTPCookieProcessor, build_opener
+
+from benchmarks.bench_routes import PAGE_SIZE, percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+PATHS = ("/dashboard", "/api/transactions?limit=50", "/api/analytics", "/export/csv")
+# The threaded mode is what `python app.py` runs today (minus the debugger/reloader).
+SERVERS = {
+    "threaded": "from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)",
+    "asgi": "import asgi; asgi.main()",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, storage: Path) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ALTERNATIF_BANK_STORAGE=str(storage),
+        ALTERNATIF_BANK_PORT=str(port),
+        ALTERNATIF_BANK_LOG_LEVEL="warning",
+        PYTHONPATH=str(ROOT),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[mode].format(port=port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def sign_up(port: int, transfers: int) -> str:
+    # Registers a user over HTTP, posts some history so the pages have rows to render, and
+    # returns the session cookie header the load clients reuse.
+    jar = CookieJar()
+    opener = build_opener(HTTPCookieProcessor(jar))
+    base = f"http://127.0.0.1:{port}"
+
+    def post(path: str, **fields: Any) -> None:
+        opener.open(base + path, urllib.parse.urlencode(fields).encode("ascii")).read()
+
+    post("/register", full_name="Yük Testi", contact="load@example.com", contact_type="email")
+    post("/verify", otp="123456")
+    for index in range(transfers):
+        post("/transfer", iban="TR000000000000000000000000", amount=f"{1 + index % 50}", description=f"Test {index}")
+    return "; ".join(f"{cookie.name}={cookie.value}" for cookie in jar)
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, bool]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("closed")
+    version, status = status_line.split(b" ", 2)[:2]
+    headers: Dict[bytes, bytes] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get(b"transfer-encoding", b"").lower() == b"chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+        closing = False
+    elif b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+        closing = False
+    else:
+        await reader.read()
+        closing = True
+    connection = headers.get(b"connection", b"").lower()
+    closing = closing or connection == b"close" or (version == b"HTTP/1.0" and connection != b"keep-alive")
+    return int(status), closing
+
+
+async def client(port: int, cookie: str, requests: int, offset: int, latencies: List[float], errors: List[int]) -> None:
+    reader: Optional[asyncio.StreamReader] = None
+    writer: Optional[asyncio.StreamWriter] = None
+    for index in range(requests):
+        path = PATHS[(offset + index) % len(PATHS)]
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n\r\n".encode("latin-1"))
+            status, closing = await read_response(reader)
+            if status != 200:
+                errors.append(status)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors.append(0)
+            closing = True
+        latencies.append(time.perf_counter() - started)
+        if closing and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def server_stats(pid: int) -> Tuple[int, float]:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+        threads = int(status.split("Threads:")[1].split()[0])
+        rss = int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * PAGE_SIZE / 1024 / 1024
+        return threads, rss
+    except (OSError, IndexError, ValueError):
+        return 0, 0.0
+
+
+async def load(port: int, pid: int, cookie: str, connections: int, requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[int] = []
+    peak = [0, 0.0]
+
+    async def sample() -> None:
+        while True:
+            threads, rss = server_stats(pid)
+            peak[0], peak[1] = max(peak[0], threads), max(peak[1], rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample())
+    per_client = max(1, requests // connections)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client(port, cookie, per_client, index, latencies, errors) for index in range(connections))
+    )
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_threads": peak[0],
+        "peak_rss_mib": round(peak[1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Threaded dev server vs. the ASGI entry point under concurrent connections")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--modes", nargs="+", choices=tuple(SERVERS), default=list(SERVERS))
+    parser.add_argument("--connections", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--history", type=int, default=200, help="transfers posted before the run")
+    parser.add_argument("--output", type=Path, help="where to save the results (JSON)")
+    args = parser.parse_args()
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    print(f"{'mode':<9} {'conns':>6} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'threads':>8} {'RSS MiB':>8}")
+    for mode in args.modes:
+        workdir = Path(tempfile.mkdtemp(prefix="alternatif-serving-"))
+        port = free_port()
+        process = start_server(mode, port, workdir / ("bench.db" if args.backend == "sqlite" else "bench.json"))
+        try:
+            cookie = sign_up(port, args.history)
+            results[mode] = []
+            for connections in args.connections:
+                result = asyncio.run(load(port, process.pid, cookie, connections, args.requests))
+                results[mode].append(result)
+                print(
+                    f"{mode:<9} {connections:>6} {result['requests']:>6} {result['errors']:>5} {result['rps']:>8.1f}"
+                    f" {result['p50_ms']:>8.2f} {result['p99_ms']:>9.2f} {result['peak_threads']:>8}"
+                    f" {result['peak_rss_mib']:>8.1f}"
+                )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nsaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# app opens its storage at import time; point it somewhere disposable.
+os.environ.setdefault("ALTERNATIF_BANK_STORAGE", str(Path(tempfile.mkdtemp()) / "bench_app.json"))
+
+import codec  # noqa: E402
+from app import build_default_user  # noqa: E402
+from storage import DEFAULT_DATA, JsonStorage, strip_history  # noqa: E402
+
+
+def synthetic_data(users: int) -> Dict[str, Any]:
+    minted: List[Dict[str, Any]] = []
+    for user_id in range(1, users + 1):
+        user = strip_history(build_default_user(f"Kullanıcı {user_id}", f"user{user_id}@example.com", "email"))
+        user["id"] = user_id
+        minted.append(user)
+    return {"next_user_id": users + 1, "users": minted, "billers": DEFAULT_DATA["billers"]}
+
+
+def timed(func: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def cold_start(path: Path, binary_snapshot: bool) -> float:
+    # A fresh storage object has no parsed snapshot, so the first lookup pays the full load.
+    storage = JsonStorage(path, binary_snapshot=binary_snapshot)
+    return timed(lambda: storage.get_user(1))
+
+
+def run(users: int) -> Dict[str, float]:
+    data = synthetic_data(users)
+    results: Dict[str, float] = {"users": users}
+
+    pretty = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    results["pretty_save"] = timed(lambda: json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+    results["pretty_load"] = timed(lambda: json.loads(pretty))
+    results["pretty_mib"] = len(pretty) / 2**20
+
+    compact = codec.dumps(data)
+    results["codec_save"] = timed(lambda: codec.dumps(data))
+    results["codec_load"] = timed(lambda: codec.loads(compact))
+    results["codec_mib"] = len(compact) / 2**20
+
+    binary = codec.encode_snapshot(data)
+    results["binary_save"] = timed(lambda: codec.encode_snapshot(data))
+    results["binary_mib"] = len(binary) / 2**20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.json"
+        storage = JsonStorage(path)
+        storage.save_data(data)
+        results["start_json"] = cold_start(path, binary_snapshot=False)
+        results["start_mmap"] = cold_start(path, binary_snapshot=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON storage load/save timings")
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    print(f"codec: {codec.JSON_BACKEND}, binary snapshot: marshal")
+    print(
+        f"{'users':>7} {'indent=2 save/load s':>21} {'MiB':>6} {'codec save/load s':>18} {'MiB':>6}"
+        f" {'binary save s':>13} {'MiB':>6} {'start json/mmap s':>18}"
+    )
+    for users in args.users:
+        r = run(users)
+        print(
+            f"{r['users']:>7} {r['pretty_save']:>10.3f}/{r['pretty_load']:<10.3f} {r['pretty_mib']:>6.1f}"
+            f" {r['codec_save']:>8.3f}/{r['codec_load']:<9.3f} {r['codec_mib']:>6.1f}"
+            f" {r['binary_save']:>13.3f} {r['binary_mib']:>6.1f}"
+            f" {r['start_json']:>8.3f}/{r['start_mmap']:<9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
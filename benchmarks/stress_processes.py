@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Run from the repository root: python -m benchmarks.stress_processes --backend sqlite
+# (running the file directly works too; the root is put on sys.path below).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Several worker processes hammer /transfer/batch against one storage path, some of them
+# checkpointing as they go and optionally one killed mid-run; afterwards a fresh storage
+# object must show every account balance equal to its opening balance plus its journal,
+# the grand total unchanged and nothing overdrawn. Exits 1 if any of that fails.
+
+
+def load_app(storage_path: str) -> Any:
+    os.environ["ALTERNATIF_BANK_STORAGE"] = storage_path
+    app_module = importlib.import_module("app")
+    app_module.app.config["TESTING"] = True
+    return app_module
+
+
+def worker(
+    storage_path: str,
+    contacts: List[str],
+    ibans: List[str],
+    transfers: int,
+    checkpoint_every: int,
+    seed: int,
+    results: Any,
+) -> None:
+    app_module = load_app(storage_path)
+    rng = random.Random(seed)
+    clients = []
+    for contact in contacts:
+        client = app_module.app.test_client()
+        client.post("/login", data={"contact": contact})
+        client.post("/verify", data={"otp": "123456"})
+        clients.append(client)
+    counts = {"ok": 0, "rejected": 0, "failed": 0}
+    for index in range(transfers):
+        client = rng.choice(clients)
+        items = [
+            {"iban": rng.choice(ibans), "amount": rng.choice((5, 20, 50, 250)), "fast": rng.random() < 0.5}
+            for _ in range(rng.randint(1, 3))
+        ]
+        response = client.post("/transfer/batch", json=items)
+        if response.status_code == 200:
+            counts["ok"] += response.get_json()["count"]
+        elif response.status_code == 409:
+            counts["rejected"] += 1
+        else:
+            # Rows addressed to the sender's own account are rejected up front; not an error.
+            counts["failed" if response.status_code != 400 else "rejected"] += 1
+        # Checkpoints from several processes exercise the WAL being replaced under the others.
+        if checkpoint_every and (index + 1) % checkpoint_every == 0 and hasattr(app_module.storage, "checkpoint"):
+            app_module.storage.checkpoint()
+    results.put((seed, counts))
+
+
+def setup(storage_path: str, users: int) -> Tuple[List[str], Dict[str, float], int]:
+    app_module = load_app(storage_path)
+    storage = app_module.storage
+    contacts, opening = [], {}
+    for index in range(users):
+        contact = f"stress{index}@example.com"
+        user = storage.create_user(
+            app_module.build_default_user(f"Yük {index}", contact, "email", storage.iban_exists)
+        )
+        contacts.append(contact)
+        for account in user["accounts"]:
+            opening[account["iban"]] = account["balance"]
+    last_id = max(
+        (row["id"] for user_id in range(1, users + 1) for row in storage.transactions(user_id, limit=1)), default=0
+    )
+    if hasattr(storage, "close"):
+        storage.close()
+    return contacts, opening, last_id
+
+
+def verify(storage_path: str, opening: Dict[str, float], last_id: int, users: int) -> Tuple[List[str], int]:
+    # A separate interpreter, so nothing cached by this process can hide a lost update.
+    from storage import open_storage
+
+    storage = open_storage(storage_path)
+    problems: List[str] = []
+    moved: Dict[str, float] = {iban: 0.0 for iban in opening}
+    rows = 0
+    balances: Dict[str, float] = {}
+    for user_id in range(1, users + 1):
+        user = storage.get_user(user_id)
+        for account in user["accounts"]:
+            balances[account["iban"]] = account["balance"]
+            if account["balance"] < 0:
+                problems.append(f"{account['iban']} overdrawn: {account['balance']}")
+        for row in storage.transactions(user_id, after=last_id):
+            moved[row["iban"]] = moved.get(row["iban"], 0.0) + row["amount"]
+            rows += 1
+    for iban, start in opening.items():
+        if round(start + moved[iban], 2) != round(balances[iban], 2):
+            problems.append(f"{iban}: opening {start} + journal {moved[iban]:.2f} != balance {balances[iban]}")
+    before, after = round(sum(opening.values()), 2), round(sum(balances.values()), 2)
+    if before != after:
+        problems.append(f"total changed: {before} -> {after}")
+    return problems, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-process transfer stress test with balance conservation checks")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=200, help="batch requests per process")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="JSON checkpoint every N requests per process (0: off)")
+    parser.add_argument("--kill-after", type=float, default=0.0, help="SIGKILL the first worker after this many seconds")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="alternatif-stress-"))
+    storage_path = str(workdir / ("stress.db" if args.backend == "sqlite" else "stress.json"))
+    context = multiprocessing.get_context("spawn")
+    # Setting up in a child keeps this interpreter free of app state for the final check.
+    with context.Pool(1) as pool:
+        contacts, opening, last_id = pool.apply(setup, (storage_path, args.users))
+    ibans = sorted(opening)
+
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(
+                storage_path,
+                contacts[index::args.processes] or contacts,
+                ibans,
+                args.transfers,
+                args.checkpoint_every,
+                index,
+                results,
+            ),
+        )
+        for index in range(args.processes)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    if args.kill_after:
+        time.sleep(args.kill_after)
+        processes[0].kill()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    counts = {"ok": 0, "rejected": 0, "failed": 0}
+    reported = 0
+    while not results.empty():
+        _, worker_counts = results.get()
+        reported += 1
+        for key, value in worker_counts.items():
+            counts[key] += value
+
+    with context.Pool(1) as pool:
+        problems, rows = pool.apply(verify, (storage_path, opening, last_id, args.users))
+    # Each completed transfer is two journal rows; only checkable when no worker was killed.
+    if reported == args.processes and rows != 2 * counts["ok"]:
+        problems.append(f"{counts['ok']} transfers reported but {rows} journal rows written")
+    if counts["failed"]:
+        problems.append(f"{counts['failed']} requests failed")
+    print(
+        f"{args.backend}: {args.processes} processes, {counts['ok']} transfers ({counts['rejected']} rejected)"
+        f" in {elapsed:.1f}s, {rows} journal rows, {reported}/{args.processes} workers finished"
+    )
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("balances conserved")
+
+
+if __name__ == "__main__":
+    main()
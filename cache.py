@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Union
+
+from metrics import count_io
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class StatementCache:
+    # Rendered statements keyed by an ETag derived from the user's history revision, so an
+    # append makes every older entry unreachable even before invalidate_user() drops it.
+    def __init__(
+        self,
+        maxsize: int = 64,
+        max_entry_bytes: int = 4 * 1024 * 1024,
+        directory: Optional[Union[str, Path]] = None,
+    ) -> None:
+        self.max_entry_bytes = max_entry_bytes
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._memory = LRUCache(maxsize)
+        self._etags: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+
+    @property
+    def hits(self) -> int:
+        return self._memory.hits + self.disk_hits
+
+    @property
+    def misses(self) -> int:
+        return self._memory.misses - self.disk_hits
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _path(self, user_id: int, etag: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{user_id}-{etag}"
+
+    def _remember(self, user_id: int, etag: str, body: bytes) -> None:
+        self._memory.put(etag, body)
+        with self._lock:
+            etags = {known for known in self._etags.get(user_id, ()) if known in self._memory}
+            etags.add(etag)
+            self._etags[user_id] = etags
+
+    def get(self, user_id: int, etag: str) -> Optional[bytes]:
+        body = self._memory.get(etag)
+        if body is None and self.directory is not None:
+            try:
+                body = self._path(user_id, etag).read_bytes()
+            except FileNotFoundError:
+                return None
+            count_io("statement_cache", "read", len(body))
+            self.disk_hits += 1
+            self._remember(user_id, etag, body)
+        return body
+
+    def put(self, user_id: int, etag: str, body: bytes) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        self._remember(user_id, etag, body)
+        if self.directory is not None:
+            path = self._path(user_id, etag)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, path)
+            count_io("statement_cache", "write", len(body))
+
+    def capture(self, user_id: int, etag: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        # Tee a streamed render into the cache; anything larger than one entry is streamed only.
+        buffer: Optional[List[bytes]] = []
+        size = 0
+        for chunk in chunks:
+            if buffer is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    buffer = None
+                else:
+                    buffer.append(chunk)
+            yield chunk
+        if buffer is not None:
+            self.put(user_id, etag, b"".join(buffer))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            etags = self._etags.pop(user_id, set())
+        for etag in etags:
+            self._memory.pop(etag)
+        if self.directory is not None:
+            for path in self.directory.glob(f"{user_id}-*"):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._etags.clear()
+        self._memory.clear()
+        if self.directory is not None:
+            for path in self.directory.glob("*-*"):
+                path.unlink(missing_ok=True)
+
+
+class FragmentCache:
+    # Rendered HTML per (user, section). Each entry keeps the revision it was rendered from
+    # (the section's rows, the language and anything else the fragment shows): writes made
+    # through this process drop entries at once via invalidate(), and comparing revisions
+    # catches writes made by other worker processes, which this cache never hears about.
+    def __init__(self, maxsize: int = 4096) -> None:
+        self._memory = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def get(self, user_id: int, section: str, revision: Any) -> Optional[str]:
+        entry = self._memory.get((user_id, section))
+        if entry is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: int, section: str, revision: Any, html: str) -> None:
+        self._memory.put((user_id, section), (revision, html))
+
+    def invalidate(self, user_id: int, sections: Iterable[str]) -> None:
+        for section in sections:
+            self._memory.pop((user_id, section))
+
+    def clear(self) -> None:
+        self._memory.clear()
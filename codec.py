@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import gc
+import json
+import marshal
+import mmap
+import struct
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+SNAPSHOT_MAGIC = b"ALTBSNAP"
+# Snapshots use marshal: it decodes the data file several times faster than any JSON or
+# msgpack parser, but its output is only guaranteed to round-trip on the same interpreter.
+SNAPSHOT_TAG = f"m{marshal.version}.{sys.version_info[0]}.{sys.version_info[1]}".encode("ascii").ljust(8, b"\0")
+SNAPSHOT_HEADER = struct.Struct("<8s8sqqq")
+
+# Decoding a whole data file allocates millions of acyclic containers; letting the cyclic
+# collector run in the middle of that roughly doubles the load time.
+NO_GC_THRESHOLD = 1024 * 1024
+
+
+@contextmanager
+def gc_paused(size: int) -> Iterator[None]:
+    if size < NO_GC_THRESHOLD or not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    with gc_paused(len(data)):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+def encode_snapshot(obj: Any) -> bytes:
+    return marshal.dumps(obj)
+
+
+def frame_snapshot(payload: bytes, source_stamp: Tuple[int, int]) -> bytes:
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_TAG, source_stamp[0], source_stamp[1], len(payload)) + payload
+
+
+def read_snapshot(path: Union[str, Path], source_stamp: Tuple[int, int]) -> Optional[Any]:
+    # The binary snapshot is only a startup shortcut: it is used when it was written for
+    # exactly this version of the JSON file by a compatible decoder, otherwise None.
+    try:
+        handle = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+        with mapped:
+            if len(mapped) < SNAPSHOT_HEADER.size:
+                return None
+            magic, tag, mtime_ns, size, length = SNAPSHOT_HEADER.unpack_from(mapped)
+            if (
+                magic != SNAPSHOT_MAGIC
+                or tag != SNAPSHOT_TAG
+                or (mtime_ns, size) != tuple(source_stamp)
+                or len(mapped) != SNAPSHOT_HEADER.size + length
+            ):
+                return None
+            view = memoryview(mapped)[SNAPSHOT_HEADER.size:]
+            try:
+                with gc_paused(length):
+                    return marshal.loads(view)
+            finally:
+                view.release()
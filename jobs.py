@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Jobs go pending -> running -> done / failed / skipped; "interrupted" marks a job that was
+# running when its process died.
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs(kind, state, id);
+"""
+
+JobResult = Tuple[int, str, Dict[str, Any]]
+
+# A claim older than this belongs to a worker that died: live workers finish a batch well
+# within it, so recovery never touches jobs another process is still executing.
+JOB_LEASE = 15 * 60.0
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    kind: str
+    key: str
+    payload: Dict[str, Any]
+
+
+class JobQueue:
+    # A local SQLite file: jobs survive restarts, the (kind, key) pair makes enqueueing
+    # idempotent, and BEGIN IMMEDIATE lets several workers (or processes) claim safely.
+    def __init__(self, path: Union[str, Path], max_pending: int = 10_000, lease: float = JOB_LEASE) -> None:
+        self.path = Path(path)
+        self.max_pending = max_pending
+        self.lease = lease
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._ready_lock:
+                if not self._ready:
+                    conn.executescript(JOB_SCHEMA)
+                    self._ready = True
+        return conn
+
+    def _transaction(self) -> sqlite3.Connection:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'running')"
+        params: Tuple[Any, ...] = ()
+        if kind is not None:
+            query += " AND kind = ?"
+            params = (kind,)
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def enqueue(self, kind: str, key: str, payload: Dict[str, Any]) -> bool:
+        return self.enqueue_many(kind, [(key, payload)]) == 1
+
+    def enqueue_many(self, kind: str, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        # Backpressure: only as many jobs as fit under max_pending are accepted; the rest are
+        # left for the next collection pass instead of growing the queue without bound.
+        conn = self._transaction()
+        try:
+            room = self.max_pending - conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'running')"
+            ).fetchone()[0]
+            added = 0
+            now = time.time()
+            for key, payload in items:
+                if added >= room:
+                    break
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (kind, key, payload, created, updated) VALUES (?, ?, ?, ?, ?)",
+                    (kind, key, json.dumps(payload, ensure_ascii=False), now, now),
+                )
+                added += cursor.rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return added
+
+    def claim(self, kind: str, limit: int) -> List[Job]:
+        conn = self._transaction()
+        try:
+            rows = conn.execute(
+                "SELECT id, key, payload FROM jobs WHERE kind = ? AND state = 'pending' ORDER BY id LIMIT ?",
+                (kind, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET state = 'running', updated = ? WHERE id = ?",
+                [(time.time(), row["id"]) for row in rows],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return [Job(row["id"], kind, row["key"], json.loads(row["payload"])) for row in rows]
+
+    def finish(self, results: List[JobResult]) -> None:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET state = ?, result = ?, updated = ? WHERE id = ?",
+                [(state, json.dumps(result, ensure_ascii=False), now, job_id) for job_id, state, result in results],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def recover(self, kind: str) -> int:
+        # A job left running by a crashed worker may or may not have taken effect, so it is
+        # not retried automatically; it is parked for review instead. Only claims past the
+        # lease count as abandoned; younger ones may be running in another worker process.
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET state = 'interrupted', updated = ? WHERE kind = ? AND state = 'running' AND updated < ?",
+            (now, kind, now - self.lease),
+        )
+        return cursor.rowcount
+
+    def counts(self, kind: str) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT state, COUNT(*) AS count FROM jobs WHERE kind = ? GROUP BY state", (kind,))
+        return {row["state"]: row["count"] for row in rows}
+
+    def recent(self, kind: str, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT id, key, payload, state, result, updated FROM jobs WHERE kind = ? ORDER BY id DESC LIMIT ?",
+            (kind, limit),
+        )
+        return [
+            {
+                "id": row["id"],
+                "key": row["key"],
+                "payload": json.loads(row["payload"]),
+                "state": row["state"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+                "updated": row["updated"],
+            }
+            for row in rows
+        ]
+
+
+class JobRunner:
+    # One scheduler thread periodically collects work into the queue; a fixed pool of
+    # worker threads claims it in batches. The pool size bounds concurrency and the
+    # queue's max_pending bounds how far collection can run ahead of execution.
+    def __init__(
+        self,
+        queue: JobQueue,
+        kind: str,
+        collect: Callable[[], Iterable[Tuple[str, Dict[str, Any]]]],
+        execute: Callable[[List[Job]], List[JobResult]],
+        workers: int = 2,
+        batch_size: int = 50,
+        interval: float = 60.0,
+    ) -> None:
+        self.queue = queue
+        self.kind = kind
+        self.collect = collect
+        self.execute = execute
+        self.workers = workers
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wake = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def schedule(self) -> int:
+        added = self.queue.enqueue_many(self.kind, self.collect())
+        if added:
+            with self._wake:
+                self._wake.notify_all()
+        return added
+
+    def work(self) -> List[JobResult]:
+        # Runs one batch; an empty list means the queue had nothing pending.
+        jobs = self.queue.claim(self.kind, self.batch_size)
+        if not jobs:
+            return []
+        try:
+            results = self.execute(jobs)
+        except Exception as exc:
+            # execute() records per-job failures itself; getting here means it stopped partway,
+            # and any of these jobs may already have taken effect.
+            logger.exception("%s batch failed", self.kind)
+            results = [(job.id, "interrupted", {"error": str(exc)}) for job in jobs]
+        self.queue.finish(results)
+        return results
+
+    def run_once(self) -> Dict[str, int]:
+        # Synchronous collect-and-drain for the CLI command.
+        totals: Dict[str, int] = {}
+        while True:
+            self.schedule()
+            batch = self.work()
+            if not batch:
+                break
+            for _, state, _ in batch:
+                totals[state] = totals.get(state, 0) + 1
+        return totals
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self.queue.recover(self.kind)
+        self._threads = [threading.Thread(target=self._schedule_loop, name=f"{self.kind}-scheduler", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._work_loop, name=f"{self.kind}-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _schedule_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                # Claims abandoned by a worker process that died since the last pass.
+                self.queue.recover(self.kind)
+                self.schedule()
+            except Exception:
+                logger.exception("%s collection failed", self.kind)
+            self._stopped.wait(self.interval)
+
+    def _work_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self.work():
+                    continue
+            except Exception:
+                logger.exception("%s worker failed", self.kind)
+            with self._wake:
+                self._wake.wait(self.interval)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import os
+import threading
+from pathlib import Path
+from typing import Any, Collection, Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+import codec
+from metrics import count_io
+
+TransactionEntry = Tuple[int, Optional[str], Dict[str, Any]]
+
+
+class TransactionJournal:
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._offsets: List[int] = []
+        self._dates: List[str] = []
+        self._channels: List[str] = []
+        # Entry seqs per user id, per IBAN and per (user id or IBAN, channel), oldest first.
+        self._lists: Dict[Hashable, List[int]] = {}
+        # Position in each list after which dates never go backwards again.
+        self._ordered_from: Dict[Hashable, int] = {}
+        self._indexed_size = 0
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return len(self._offsets)
+
+    def _catch_up(self) -> None:
+        # Other writers only ever append, so indexing the unseen tail keeps the offsets current.
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self._indexed_size:
+            self._offsets = []
+            self._dates = []
+            self._channels = []
+            self._lists = {}
+            self._ordered_from = {}
+            self._indexed_size = 0
+        if size == self._indexed_size:
+            return
+        with self.path.open("rb") as handle:
+            handle.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                self._index(offset, codec.loads(line))
+                offset += len(line)
+        count_io("journal", "read", offset - self._indexed_size)
+        self._indexed_size = offset
+
+    def _index(self, offset: int, record: Dict[str, Any]) -> None:
+        date, channel = record.get("date", ""), record.get("channel", "")
+        self._dates.append(date)
+        self._channels.append(channel)
+        self._offsets.append(offset)
+        seq = len(self._offsets)
+        owners = [record["user_id"], record["iban"]] if record.get("iban") else [record["user_id"]]
+        for key in owners + [(owner, channel) for owner in owners]:
+            seqs = self._lists.setdefault(key, [])
+            if seqs and date < self._dates[seqs[-1] - 1]:
+                self._ordered_from[key] = len(seqs)
+            seqs.append(seq)
+
+    def _date_bound(self, seqs: List[int], date: str, lo: int, hi: int) -> int:
+        # bisect_left over the dates of seqs[lo:hi], which must not go backwards.
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if self._dates[seqs[middle] - 1] < date:
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+    def append(self, entries: List[TransactionEntry]) -> List[int]:
+        lines = [
+            codec.dumps({"user_id": user_id, "iban": iban, **{k: v for k, v in trx.items() if k not in ("id", "iban")}})
+            + b"\n"
+            for user_id, iban, trx in entries
+        ]
+        with self._lock:
+            self._catch_up()
+            payload = b"".join(lines)
+            with self.path.open("ab") as handle:
+                handle.write(payload)
+            count_io("journal", "write", len(payload))
+            seqs = []
+            for line, (user_id, iban, trx) in zip(lines, entries):
+                self._index(self._indexed_size, {"user_id": user_id, "iban": iban, **trx})
+                self._indexed_size += len(line)
+                seqs.append(len(self._offsets))
+            return seqs
+
+    def last_user_seq(self, user_id: int) -> int:
+        with self._lock:
+            self._catch_up()
+            seqs = self._lists.get(user_id)
+            return seqs[-1] if seqs else 0
+
+    def has_user(self, user_id: int, after: int = 0) -> bool:
+        with self._lock:
+            self._catch_up()
+            seqs = self._lists.get(user_id, [])
+            return bool(seqs) and seqs[-1] > after
+
+    def iter(
+        self,
+        user_id: Optional[int] = None,
+        iban: Optional[str] = None,
+        before: Optional[int] = None,
+        after: int = 0,
+        channels: Optional[Collection[str]] = None,
+        date_from: Optional[str] = None,
+        date_until: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        owner: Hashable = iban if iban is not None else user_id
+        keys = [(owner, channel) for channel in sorted(set(channels))] if channels else [owner]
+        runs = []
+        with self._lock:
+            self._catch_up()
+            offsets, dates = self._offsets, self._dates
+            for key in keys:
+                seqs = self._lists.get(key, [])
+                end = len(seqs) if before is None else bisect.bisect_left(seqs, before)
+                start = bisect.bisect_right(seqs, after, 0, end)
+                # Histories are appended in date order, so the date range is usually a slice
+                # of the list too; only a stretch where dates went backwards is filtered row by row.
+                if self._ordered_from.get(key, 0) <= start:
+                    if date_until is not None:
+                        end = self._date_bound(seqs, date_until, start, end)
+                    if date_from is not None:
+                        start = self._date_bound(seqs, date_from, start, end)
+                if start < end:
+                    runs.append(map(seqs.__getitem__, range(end - 1, start - 1, -1)))
+        if not runs:
+            return
+        # Each channel has its own list, so a filtered page never visits another channel's rows;
+        # the lists are append-only, so walking them backwards outside the lock is safe.
+        walk = runs[0] if len(runs) == 1 else heapq.merge(*runs, reverse=True)
+        read = 0
+        with self.path.open("rb") as handle:
+            try:
+                for seq in walk:
+                    if date_from is not None and dates[seq - 1] < date_from:
+                        continue
+                    if date_until is not None and dates[seq - 1] >= date_until:
+                        continue
+                    handle.seek(offsets[seq - 1])
+                    line = handle.readline()
+                    read += len(line)
+                    record = codec.loads(line)
+                    if user_id is not None and record["user_id"] != user_id:
+                        continue
+                    record.pop("user_id")
+                    record["id"] = seq
+                    yield record
+            finally:
+                count_io("journal", "read", read)
+
+    def sync(self) -> None:
+        with self._lock:
+            try:
+                with self.path.open("rb") as handle:
+                    os.fsync(handle.fileno())
+            except FileNotFoundError:
+                pass
+
+    def truncate_to(self, seq: int) -> None:
+        # Cuts the journal after entry `seq`, which also drops a torn trailing line.
+        with self._lock:
+            self._catch_up()
+            if not self.path.exists():
+                return
+            end = self._offsets[seq] if seq < len(self._offsets) else self._indexed_size
+            if self.path.stat().st_size > end:
+                with self.path.open("r+b") as handle:
+                    handle.truncate(end)
+                self._catch_up()
+
+    def truncate(self) -> None:
+        with self._lock:
+            self.path.write_bytes(b"")
+            self._catch_up()
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import sys
+import threading
+import time
+from collections import Counter as SampleCounter
+from collections.abc import Iterator as IteratorABC
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STORAGE_OPERATIONS = (
+    "load_data",
+    "save_data",
+    "get_user",
+    "user_section",
+    "find_user_id_by_contact",
+    "locate_iban",
+    "locate_ibans",
+    "iban_exists",
+    "revision",
+    "user_version",
+    "history_revision",
+    "history_generation",
+    "create_user",
+    "save_user",
+    "patch_user",
+    "replace_user",
+    "post",
+    "notify",
+    "notifications",
+    "notification_state",
+    "mark_notifications_read",
+    "due_autopays",
+    "transactions",
+    "billers",
+)
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), value: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labelnames: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[position] += 1
+            row[-1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        row = self._values.get(labels)
+        return int(sum(row[:-1])) if row else 0
+
+    def total(self, labels: Labels = ()) -> float:
+        row = self._values.get(labels)
+        return row[-1] if row else 0.0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((labels, list(row)) for labels, row in self._values.items())
+        for labels, row in values:
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, None), row[:-1]):
+                cumulative += count
+                le = "+Inf" if bound is None else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                yield f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {row[-1]!r}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cumulative)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Union[Counter, Histogram]] = []
+        # Collectors read values that live elsewhere (cache sizes, hit counters) at scrape time.
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Labels = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help_text: str, labelnames: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help_text: str, kind: str, labelnames: Labels, samples: Dict[Labels, float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(samples.items()):
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return lines
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram(
+    "alternatif_bank_request_duration_seconds", "Time from request start until the response body is sent.", ("endpoint", "method")
+)
+REQUESTS = REGISTRY.counter("alternatif_bank_requests_total", "Handled requests.", ("endpoint", "method", "status"))
+STORAGE_SECONDS = REGISTRY.histogram(
+    "alternatif_bank_storage_operation_seconds", "Time spent inside storage calls.", ("operation",)
+)
+TEMPLATE_SECONDS = REGISTRY.histogram("alternatif_bank_template_render_seconds", "Template render time.", ("template",))
+IO_BYTES = REGISTRY.counter(
+    "alternatif_bank_storage_bytes_total", "Bytes read from or written to storage files.", ("file", "direction")
+)
+SLOW_REQUESTS = REGISTRY.counter(
+    "alternatif_bank_slow_requests_total", "Requests over the profiler threshold.", ("endpoint",)
+)
+
+
+def count_io(file: str, direction: str, size: int) -> None:
+    if size:
+        IO_BYTES.inc((file, direction), size)
+
+
+_local = threading.local()
+
+
+def _timed_iter(operation: str, iterator: Iterator[Any]) -> Iterator[Any]:
+    # Lazy results (transaction pages, exports) are charged for the time spent producing
+    # each item, which is where the reads actually happen.
+    elapsed = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        STORAGE_SECONDS.observe((operation,), elapsed)
+
+
+def _timed(operation: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        # Storage methods call each other; only the outermost call is recorded so the
+        # per-operation totals add up to the time the request actually waited.
+        if getattr(_local, "depth", 0):
+            return method(*args, **kwargs)
+        _local.depth = 1
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _local.depth = 0
+            elapsed = time.perf_counter() - started
+        if isinstance(result, IteratorABC):
+            return _timed_iter(operation, result)
+        STORAGE_SECONDS.observe((operation,), elapsed)
+        return result
+
+    return wrapper
+
+
+def instrument_storage(storage: Any) -> Any:
+    for operation in STORAGE_OPERATIONS:
+        method = getattr(storage, operation, None)
+        if method is not None:
+            setattr(storage, operation, _timed(operation, method))
+    return storage
+
+
+class SamplingProfiler:
+    # Samples the stacks of threads that are serving a request and keeps them only when the
+    # request turns out slow; the folded "frame;frame;frame count" lines feed flamegraph.pl
+    # or speedscope directly.
+    def __init__(self, directory: Union[str, Path], threshold: float, interval: float = 0.005) -> None:
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.interval = interval
+        self._active: Dict[int, SampleCounter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, ident: int) -> None:
+        with self._lock:
+            self._active[ident] = SampleCounter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, ident: int) -> SampleCounter:
+        with self._lock:
+            return self._active.pop(ident, SampleCounter())
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in active:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                samples[";".join(reversed(stack))] += 1
+
+    def dump(self, endpoint: str, samples: SampleCounter) -> Optional[Path]:
+        if not samples:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{endpoint}.folded"
+        with self._lock, path.open("a", encoding="utf-8") as handle:
+            handle.writelines(f"{stack} {count}\n" for stack, count in samples.items())
+        return path
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from storage import LAZY_SECTIONS, PROFILE_FIELDS
+
+CORE_SECTIONS = ("accounts", "cards", "payments")
+
+SectionLoader = Callable[[int, str], List[Dict[str, Any]]]
+
+
+def _copy_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Section rows are at most two levels deep (card settings), which makes this much
+    # cheaper than copy.deepcopy on every request.
+    return [{key: dict(value) if isinstance(value, dict) else value for key, value in row.items()} for row in rows]
+
+
+def _diff_rows(section: str, rows: List[Dict[str, Any]], base: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Rows past the baseline are appended with "-" so that concurrent appends from other
+    # requests are not overwritten by position.
+    ops: List[Dict[str, Any]] = []
+    for index, row in enumerate(rows):
+        if index >= len(base):
+            ops.append({"op": "add", "path": f"/{section}/-", "value": row})
+        elif row != base[index]:
+            ops.append({"op": "replace", "path": f"/{section}/{index}", "value": row})
+    for index in range(len(base) - 1, len(rows) - 1, -1):
+        ops.append({"op": "remove", "path": f"/{section}/{index}"})
+    return ops
+
+
+def _lazy_section(name: str) -> property:
+    def load(self: "UserRecord") -> List[Dict[str, Any]]:
+        sections = self._sections
+        if name not in sections:
+            rows = self._loader(self.id, name) if self._loader else []
+            self._section_base[name] = rows
+            sections[name] = _copy_rows(rows)
+        return sections[name]
+
+    def store(self: "UserRecord", value: List[Dict[str, Any]]) -> None:
+        if name not in self._sections:
+            load(self)
+        self._sections[name] = value
+
+    return property(load, store)
+
+
+class UserRecord:
+    # Profile fields and the small sections live in slots; notifications and support
+    # messages are fetched through the loader on first access and only written back
+    # when they were loaded.
+    __slots__ = ("id", *PROFILE_FIELDS, *CORE_SECTIONS, "_sections", "_loader", "_baseline", "_section_base")
+
+    FIELDS = ("id", *PROFILE_FIELDS, *CORE_SECTIONS, *LAZY_SECTIONS)
+
+    notifications = _lazy_section("notifications")
+    support_messages = _lazy_section("support_messages")
+
+    def __init__(self, loader: Optional[SectionLoader] = None) -> None:
+        self._sections: Dict[str, List[Dict[str, Any]]] = {}
+        self._loader = loader
+        self._baseline: Optional[UserRecord] = None
+        self._section_base: Dict[str, List[Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], loader: Optional[SectionLoader] = None) -> "UserRecord":
+        record = cls(loader)
+        record.id = data.get("id")
+        for field in PROFILE_FIELDS:
+            setattr(record, field, data.get(field))
+        for section in CORE_SECTIONS:
+            setattr(record, section, data.get(section, []))
+        for section in LAZY_SECTIONS:
+            if section in data:
+                record._sections[section] = data[section]
+                record._section_base[section] = _copy_rows(data[section])
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"id": self.id}
+        for field in PROFILE_FIELDS:
+            data[field] = getattr(self, field)
+        for section in CORE_SECTIONS:
+            data[section] = getattr(self, section)
+        data.update(self._sections)
+        return data
+
+    def copy(self, track: bool = True) -> "UserRecord":
+        # A tracked copy diffs against this record, so copies handed out by the user cache
+        # report only what the request changed.
+        record = UserRecord(self._loader)
+        record.id = self.id
+        for field in PROFILE_FIELDS:
+            setattr(record, field, getattr(self, field))
+        for section in CORE_SECTIONS:
+            setattr(record, section, _copy_rows(getattr(self, section)))
+        for section, rows in self._sections.items():
+            record._sections[section] = _copy_rows(rows)
+            record._section_base[section] = rows if track else _copy_rows(rows)
+        record._baseline = self if track else None
+        return record
+
+    def changes(self) -> Optional[List[Dict[str, Any]]]:
+        base = self._baseline
+        if base is None:
+            return None
+        ops: List[Dict[str, Any]] = [
+            {"op": "replace", "path": f"/{field}", "value": getattr(self, field)}
+            for field in PROFILE_FIELDS
+            if getattr(self, field) != getattr(base, field)
+        ]
+        for section in CORE_SECTIONS:
+            ops.extend(_diff_rows(section, getattr(self, section), getattr(base, section)))
+        for section, rows in self._sections.items():
+            ops.extend(_diff_rows(section, rows, self._section_base.get(section, [])))
+        return ops
+
+    def mark_clean(self) -> None:
+        clean = self.copy(track=False)
+        self._baseline = clean
+        self._section_base = dict(clean._sections)
+
+    @property
+    def loaded_sections(self) -> Tuple[str, ...]:
+        return tuple(self._sections)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __repr__(self) -> str:
+        return f"UserRecord(id={self.id!r}, loaded={self.loaded_sections!r})"
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import csv
+import io
+import unicodedata
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+STATEMENT_TITLE = "Alternatif Bank - Hesap Özeti"
+STATEMENT_CSV_FIELDS = ("date", "description", "amount", "channel", "counterparty")
+STATEMENT_CSV_CHUNK = 16 * 1024
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_TOP = 800
+PAGE_BOTTOM = 50
+FONT_SIZE = 11
+LINE_HEIGHT = 15
+LINES_PER_PAGE = (PAGE_TOP - PAGE_BOTTOM) // LINE_HEIGHT
+
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+FIRST_PAGE_ID = 4
+
+
+def _escape_pdf_text(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return (
+        ascii_text.replace("\\", "\\\\")
+        .replace("(", "\\(")
+        .replace(")", "\\)")
+    )
+
+
+def _page_stream(lines: List[str], page_number: int) -> bytes:
+    text_ops = ["BT", f"/F1 {FONT_SIZE} Tf", f"{LINE_HEIGHT} TL", f"50 {PAGE_TOP} Td"]
+    for line in lines:
+        text_ops.append(f"({_escape_pdf_text(line)}) '")
+    text_ops.append("ET")
+    text_ops.extend(["BT", "/F1 9 Tf", f"{PAGE_WIDTH - 100} 30 Td", f"(Sayfa {page_number}) Tj", "ET"])
+    return "\n".join(text_ops).encode("latin1", errors="replace")
+
+
+def _paginate(lines: Iterable[str]) -> Iterator[List[str]]:
+    page: List[str] = []
+    for line in lines:
+        page.append(line)
+        if len(page) == LINES_PER_PAGE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def iter_pdf_from_lines(lines: Iterable[str], compress: bool = True) -> Iterator[bytes]:
+    # Pages are emitted as soon as they fill up; the page tree is written last because
+    # its /Kids and /Count are only known once the input is exhausted.
+    offsets: Dict[int, int] = {}
+    position = 0
+
+    def emit(obj_id: int, content: bytes) -> bytes:
+        nonlocal position
+        offsets[obj_id] = position
+        chunk = f"{obj_id} 0 obj\n".encode("latin1") + content + b"\nendobj\n"
+        position += len(chunk)
+        return chunk
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header + emit(CATALOG_ID, f"<< /Type /Catalog /Pages {PAGES_ID} 0 R >>".encode("latin1")) + emit(
+        FONT_ID, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    )
+
+    kids: List[int] = []
+    obj_id = FIRST_PAGE_ID
+    for page_number, page_lines in enumerate(_paginate(lines), start=1):
+        stream = _page_stream(page_lines, page_number)
+        filters = ""
+        if compress:
+            stream = zlib.compress(stream)
+            filters = " /Filter /FlateDecode"
+        contents_id, page_id = obj_id, obj_id + 1
+        obj_id += 2
+        kids.append(page_id)
+        yield emit(
+            contents_id,
+            f"<< /Length {len(stream)}{filters} >>\nstream\n".encode("latin1") + stream + b"\nendstream",
+        ) + emit(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {PAGES_ID} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+                f" /Resources << /Font << /F1 {FONT_ID} 0 R >> >> /Contents {contents_id} 0 R >>"
+            ).encode("latin1"),
+        )
+
+    kids_refs = " ".join(f"{kid} 0 R" for kid in kids)
+    tail = emit(PAGES_ID, f"<< /Type /Pages /Kids [{kids_refs}] /Count {len(kids)} >>".encode("latin1"))
+    xref_pos = position
+    size = obj_id
+    xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+    xref.extend(f"{offsets[ref]:010} 00000 n \n" for ref in range(1, size))
+    xref.append(f"trailer\n<< /Size {size} /Root {CATALOG_ID} 0 R >>\nstartxref\n{xref_pos}\n%%EOF")
+    yield tail + "".join(xref).encode("latin1")
+
+
+def build_pdf_from_lines(lines: Iterable[str], compress: bool = True) -> bytes:
+    return b"".join(iter_pdf_from_lines(lines, compress=compress))
+
+
+def statement_lines(transactions: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    yield STATEMENT_TITLE
+    yield ""
+    for trx in transactions:
+        yield f"{trx['date']} | {trx['description']} | {trx['amount']:.2f} TRY | {trx['channel']}"
+
+
+def iter_statement_pdf(transactions: Iterable[Dict[str, Any]], compress: bool = True) -> Iterator[bytes]:
+    return iter_pdf_from_lines(statement_lines(transactions), compress=compress)
+
+
+def build_statement_pdf(transactions: Iterable[Dict[str, Any]], compress: bool = True) -> bytes:
+    return b"".join(iter_statement_pdf(transactions, compress=compress))
+
+
+def iter_statement_csv(transactions: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(STATEMENT_CSV_FIELDS)
+    for trx in transactions:
+        writer.writerow(
+            [trx["date"], trx["description"], f"{trx['amount']:.2f}", trx["channel"], trx["counterparty"]]
+        )
+        if buffer.tell() >= STATEMENT_CSV_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
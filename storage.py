@@ -0,0 +1,1760 @@
+from __future__ import annotations
+
+import copy
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice, takewhile
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import codec
+from journal import TransactionJournal
+from metrics import count_io
+from wal import FileLock, WriteAheadLog, replace_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA: Dict[str, Any] = {
+    "next_user_id": 1,
+    "users": [],
+    "billers": [
+        {"id": "electricity", "name": "Elektrik"},
+        {"id": "water", "name": "Su"},
+        {"id": "gsm", "name": "GSM"},
+    ],
+}
+
+PROFILE_FIELDS = (
+    "full_name",
+    "contact",
+    "contact_type",
+    "biometric_enabled",
+    "kyc_status",
+    "language",
+    "theme",
+    "notifications_enabled",
+)
+BOOLEAN_PROFILE_FIELDS = {"biometric_enabled", "notifications_enabled"}
+TRANSACTION_FIELDS = ("date", "description", "amount", "channel", "counterparty")
+CARD_SETTINGS = ("contactless", "ecommerce", "international")
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+PHONE_PATTERN = re.compile(r"^\+?[\d\s().-]+$")
+
+LEDGER_SECTIONS = ("notifications",)
+LAZY_SECTIONS = ("notifications", "support_messages")
+
+# Notifications are a per-user ring buffer: past this many the oldest are dropped.
+NOTIFICATION_RETENTION = 100
+# Per-user feed bookkeeping kept next to the profile: the last id handed out, the id the
+# user has read up to and how many retained notifications are newer than that.
+NOTIFICATION_STATE_FIELDS = ("notification_seq", "notifications_read", "unread_notifications")
+
+WAL_CHECKPOINT_ENTRIES = 1000
+WAL_CHECKPOINT_INTERVAL = 30.0
+
+
+class DuplicateContactError(ValueError):
+    pass
+
+
+class LedgerError(Exception):
+    pass
+
+
+class UnknownAccountError(LedgerError):
+    pass
+
+
+class InsufficientFundsError(LedgerError):
+    pass
+
+
+class InvalidAmountError(LedgerError):
+    pass
+
+
+@dataclass(frozen=True)
+class Posting:
+    iban: str
+    amount: float
+    transaction: Dict[str, Any]
+    notification: Optional[Dict[str, Any]] = None
+
+
+def check_postings(postings: List[Posting]) -> None:
+    # NaN slips past every balance comparison and infinities overflow it; a zero leg is a no-op
+    # that would still leave a journal row. Both backends refuse them before touching anything.
+    for posting in postings:
+        if not math.isfinite(posting.amount) or posting.amount == 0:
+            raise InvalidAmountError(posting.iban)
+
+
+def normalize_contact(contact: str) -> str:
+    contact = " ".join(contact.split())
+    if PHONE_PATTERN.match(contact):
+        digits = re.sub(r"\D", "", contact)
+        if len(digits) == 11 and digits.startswith("0"):
+            digits = "90" + digits[1:]
+        elif len(digits) == 10 and digits.startswith("5"):
+            digits = "90" + digits
+        return digits
+    return contact.replace(" ", "").casefold()
+
+
+def pair_transactions(user: Dict[str, Any]) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+    # Legacy user records keep a user-level history that mirrors every account history;
+    # pairing them yields each transaction once, oldest first, tagged with its account.
+    pending = {account["iban"]: list(account.get("transactions", [])) for account in user.get("accounts", [])}
+    paired: List[Tuple[Optional[str], Dict[str, Any]]] = []
+    for trx in reversed(user.get("transactions", [])):
+        owner = None
+        for iban, history in pending.items():
+            match = next((i for i, item in enumerate(history) if item is trx), None)
+            if match is None:
+                match = next((i for i, item in enumerate(history) if item == trx), None)
+            if match is not None:
+                history.pop(match)
+                owner = iban
+                break
+        paired.append((owner, trx))
+    for iban, history in pending.items():
+        for trx in reversed(history):
+            paired.append((iban, trx))
+    return paired
+
+
+def day_after(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def strip_history(user: Dict[str, Any]) -> Dict[str, Any]:
+    user.pop("transactions", None)
+    for account in user.get("accounts", []):
+        account.pop("transactions", None)
+    return user
+
+
+def attach_history(user: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    user["transactions"] = [{field: trx[field] for field in TRANSACTION_FIELDS} for trx in history]
+    for account in user.get("accounts", []):
+        account["transactions"] = [
+            {field: trx[field] for field in TRANSACTION_FIELDS} for trx in history if trx["iban"] == account["iban"]
+        ]
+    return user
+
+
+def push_notification(user: Dict[str, Any], notification: Dict[str, Any], retention: int) -> None:
+    # Newest first, ids increasing per user; the unread counter moves with every push
+    # instead of being recounted, and can never exceed what is still retained.
+    seq = user.get("notification_seq", 0) + 1
+    user["notification_seq"] = seq
+    notes = user.setdefault("notifications", [])
+    notes.insert(0, {**notification, "id": seq})
+    del notes[retention:]
+    user["unread_notifications"] = min(user.get("unread_notifications", 0) + 1, len(notes))
+
+
+def number_notifications(user: Dict[str, Any], previous_seq: int = 0) -> None:
+    # Notifications a record arrives with (sign-up seed data, a demo reset) were never pushed:
+    # they are numbered oldest first after the user's previous sequence and count as read, so
+    # both backends start a feed the same way and never hand out an id twice. Records whose
+    # notifications already carry ids (an import) keep the state they have.
+    notes = user.get("notifications", [])
+    if any("id" in note for note in notes):
+        user.setdefault("notification_seq", max(note.get("id", 0) for note in notes))
+        return
+    seq = max(previous_seq, user.get("notification_seq", 0))
+    user["notifications"] = [{**note, "id": seq + len(notes) - index} for index, note in enumerate(notes)]
+    user["notification_seq"] = user["notifications_read"] = seq + len(notes)
+    user["unread_notifications"] = 0
+
+
+def patch_target(path: str) -> Tuple[str, Optional[Union[int, str]]]:
+    name, _, index = path.lstrip("/").partition("/")
+    if not index:
+        return name, None
+    return name, index if index == "-" else int(index)
+
+
+def apply_patch(user: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # A JSON Patch subset: "replace" on top-level fields and rows, "add" to append rows
+    # ("-") and "remove" by row index.
+    for op in ops:
+        name, index = patch_target(op["path"])
+        if index is None:
+            user[name] = op["value"]
+            continue
+        rows = user.setdefault(name, [])
+        if op["op"] == "remove":
+            if index < len(rows):
+                del rows[index]
+        elif index == "-" or index >= len(rows):
+            rows.append(op["value"])
+        else:
+            rows[index] = op["value"]
+    return user
+
+
+def autopay_due(payment: Dict[str, Any], month: str) -> bool:
+    return bool(payment.get("autopay")) and (payment.get("amount") or 0) > 0 and (payment.get("last_paid") or "")[:7] < month
+
+
+def ledger_safe_ops(user: Dict[str, Any], ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Patches never carry ledger state: notification edits are dropped and replaced
+    # accounts keep the balance currently on record.
+    safe = []
+    accounts = user.get("accounts", [])
+    for op in ops:
+        name, index = patch_target(op["path"])
+        if name in LEDGER_SECTIONS:
+            continue
+        if name == "accounts" and op["op"] == "replace" and isinstance(index, int) and index < len(accounts):
+            op = {**op, "value": {**op["value"], "balance": accounts[index]["balance"]}}
+        safe.append(op)
+    return safe
+
+
+class Storage(ABC):
+    @abstractmethod
+    def load_data(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_data(self, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user(self, user_id: int, lazy: bool = False) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def user_section(self, user_id: int, section: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_user_id_by_contact(self, contact: str) -> Optional[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def locate_iban(self, iban: str) -> Optional[Tuple[int, int]]:
+        raise NotImplementedError
+
+    def locate_ibans(self, ibans: Collection[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        return {iban: self.locate_iban(iban) for iban in ibans}
+
+    def iban_exists(self, iban: str) -> bool:
+        return self.locate_iban(iban) is not None
+
+    @abstractmethod
+    def revision(self) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def user_version(self, user_id: int) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def history_revision(self, user_id: int) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def history_generation(self, user_id: int) -> Any:
+        # Changes only when a user's history is replaced (a reset, a full rewrite), not when
+        # rows are appended, so incremental readers know when to start over.
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_user(self, user: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def patch_user(self, user_id: int, ops: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace_user(self, user: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def post(self, postings: List[Posting]) -> List[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def notify(self, user_id: int, notification: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def notifications(self, user_id: int, after: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Newest first; `after` is a feed cursor (a notification id) and only newer ones are returned.
+        raise NotImplementedError
+
+    @abstractmethod
+    def notification_state(self, user_id: int) -> Tuple[int, int]:
+        # (latest notification id, unread count)
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_notifications_read(self, user_id: int, upto: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def due_autopays(self, month: str) -> List[Tuple[int, int, Dict[str, Any]]]:
+        # (user_id, payment position, payment) for autopay instructions with a known amount
+        # that have not been paid in `month` (YYYY-MM) yet.
+        raise NotImplementedError
+
+    @abstractmethod
+    def transactions(
+        self,
+        user_id: int,
+        iban: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: Optional[int] = None,
+        channels: Optional[Collection[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        after: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def billers(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class _Snapshot:
+    __slots__ = (
+        "stamp",
+        "data",
+        "positions",
+        "contacts",
+        "wal_offset",
+        "wal_seq",
+        "wal_inode",
+        "journal_end",
+        "pending_journal",
+    )
+
+    def __init__(self, stamp: Optional[Tuple[int, int, int]], data: Dict[str, Any]) -> None:
+        self.stamp = stamp
+        self.data = data
+        self.wal_offset = 0
+        self.wal_seq = data.get("wal_seq", 0)
+        self.wal_inode: Optional[int] = None
+        # Where the journal should end given the entries applied so far, and the lines of the
+        # last entry that wrote any, so a writer that died between the two appends can be
+        # completed by whoever takes the lock next.
+        self.journal_end: Optional[int] = data.get("journal_seq")
+        self.pending_journal: List[List[Any]] = []
+        self.positions = {user["id"]: position for position, user in enumerate(data["users"])}
+        self.contacts: Dict[str, int] = {}
+        for user in data["users"]:
+            self.contacts.setdefault(normalize_contact(user["contact"]), user["id"])
+
+    def index_contact(self, user: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+        key = normalize_contact(user["contact"])
+        owner = self.contacts.get(key)
+        if owner is not None and owner != user.get("id"):
+            raise DuplicateContactError(user["contact"])
+        if previous is not None:
+            previous_key = normalize_contact(previous["contact"])
+            if previous_key != key and self.contacts.get(previous_key) == user["id"]:
+                del self.contacts[previous_key]
+        self.contacts[key] = user["id"]
+
+    @property
+    def ibans(self) -> Dict[str, List[int]]:
+        return self.data["iban_index"]
+
+    def rebuild_iban_index(self) -> None:
+        self.data["iban_index"] = {
+            account["iban"]: [user["id"], position]
+            for user in self.data["users"]
+            for position, account in enumerate(user.get("accounts", []))
+            if account.get("iban")
+        }
+
+    def index_accounts(self, user: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+        for account in (previous or {}).get("accounts", []):
+            if self.ibans.get(account.get("iban"), [None])[0] == user["id"]:
+                del self.ibans[account["iban"]]
+        for position, account in enumerate(user.get("accounts", [])):
+            if account.get("iban"):
+                self.ibans[account["iban"]] = [user["id"], position]
+
+
+class JsonStorage(Storage):
+    def __init__(
+        self,
+        path: Union[str, Path],
+        durable: bool = True,
+        commit_window: float = 0.0,
+        checkpoint_entries: int = WAL_CHECKPOINT_ENTRIES,
+        checkpoint_interval: float = WAL_CHECKPOINT_INTERVAL,
+        binary_snapshot: bool = True,
+        notification_retention: int = NOTIFICATION_RETENTION,
+    ) -> None:
+        self.path = Path(path)
+        self.snapshot_path = self.path.with_name(f"{self.path.stem}.snapshot") if binary_snapshot else None
+        self.journal = TransactionJournal(self.path.with_name(f"{self.path.stem}.journal.jsonl"))
+        self.wal = WriteAheadLog(self.path.with_name(f"{self.path.stem}.wal.jsonl"), commit_window=commit_window)
+        # Several processes may share these files: writers take the data lock exclusively and
+        # readers shared. Checkpoints and save_data also hold the checkpoint lock (always
+        # taken first), so an older state is never stored over a newer one.
+        self._file_lock = FileLock(self.path.with_name(f"{self.path.stem}.lock"))
+        self._checkpoint_file_lock = FileLock(self.path.with_name(f"{self.path.stem}.checkpoint.lock"))
+        self.durable = durable
+        self.notification_retention = notification_retention
+        self.checkpoint_entries = checkpoint_entries
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._indexed = False
+        self._recovered = False
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint_wanted = threading.Event()
+        self._checkpointer: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, self.wal.size()
+
+    def _dataset(self) -> _Snapshot:
+        self._recover()
+        with self._lock, self._file_lock.hold(exclusive=False):
+            return self._load()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[_Snapshot]:
+        # Every mutation runs here: with the exclusive lock held the snapshot is caught up
+        # with whatever other processes appended, so checks and the new WAL sequence number
+        # are made against the latest state.
+        self._recover()
+        with self._lock, self._file_lock.hold():
+            snapshot = self._load()
+            self._reconcile(snapshot)
+            yield snapshot
+
+    def _recover(self) -> None:
+        # The first load in a process repairs whatever a writer that died left behind before
+        # anything is read, so it needs every other process out. It has to run before the
+        # caller takes a shared lock, which cannot be upgraded.
+        if self._recovered:
+            return
+        with self._lock, self._file_lock.hold():
+            if self._recovered:
+                return
+            self._reconcile(self._load())
+            self._recovered = True
+
+    def _load(self) -> _Snapshot:
+        # The parsed snapshot is reused until the data file changes; entries other writers
+        # appended to the WAL are replayed incrementally from the last offset seen.
+        stamp = self._stamp()
+        if stamp is None:
+            self._write(_Snapshot(None, copy.deepcopy(DEFAULT_DATA)))
+        elif self._snapshot is None or self._snapshot.stamp[:2] != stamp[:2]:
+            with codec.gc_paused(stamp[1]):
+                snapshot = _Snapshot(stamp, self._read_data(stamp))
+                # The persisted IBAN index is trusted once this process has rebuilt it;
+                # the first load after startup always rebuilds it from the accounts.
+                if not self._indexed or "iban_index" not in snapshot.data:
+                    snapshot.rebuild_iban_index()
+                    self._indexed = True
+                snapshot.wal_inode = self.wal.inode()
+                self._replay(snapshot, stamp)
+            self._snapshot = snapshot
+            if any("transactions" in user for user in snapshot.data["users"]):
+                self._journal_legacy_history(snapshot)
+        else:
+            snapshot = self._snapshot
+            inode = self.wal.inode()
+            if inode != snapshot.wal_inode:
+                # Another process checkpointed and replaced the WAL. Entries carry sequence
+                # numbers, so replaying the new file from its start skips what was applied.
+                snapshot.wal_offset, snapshot.wal_inode = 0, inode
+                self._replay(snapshot, stamp)
+            elif snapshot.stamp != stamp:
+                self._replay(snapshot, stamp)
+        return self._snapshot
+
+    def _read_data(self, stamp: Tuple[int, int, int]) -> Dict[str, Any]:
+        if self.snapshot_path is not None:
+            data = codec.read_snapshot(self.snapshot_path, stamp[:2])
+            if data is not None:
+                count_io("snapshot", "read", self.snapshot_path.stat().st_size)
+                return data
+        payload = self.path.read_bytes()
+        count_io("data", "read", len(payload))
+        return codec.loads(payload)
+
+    def _replay(self, snapshot: _Snapshot, stamp: Tuple[int, int, int]) -> None:
+        # Entries at or below the snapshot's wal_seq were checkpointed into the data file
+        # already; skipping them keeps replay idempotent after a crash mid-checkpoint.
+        offset = snapshot.wal_offset
+        for offset, entry in self.wal.read(offset):
+            if entry["seq"] <= snapshot.wal_seq:
+                continue
+            self._apply(snapshot, entry)
+        snapshot.wal_offset = offset
+        snapshot.stamp = (*stamp[:2], offset)
+
+    def _reconcile(self, snapshot: _Snapshot) -> None:
+        # Runs under the exclusive lock, when no writer in any process is mid-append, so
+        # whatever does not line up was left by a writer that died: a torn WAL record or
+        # journal line was never acknowledged, journal lines past the last WAL entry belong
+        # to an entry that never made it, and lines the last entry carries but the journal
+        # lacks are written now.
+        if self.wal.size() > snapshot.wal_offset:
+            self.wal.truncate(snapshot.wal_offset)
+        self.journal.truncate_to(self.journal.last_seq)
+        if snapshot.journal_end is None:
+            return
+        missing = snapshot.journal_end - self.journal.last_seq
+        if 0 < missing <= len(snapshot.pending_journal):
+            self.journal.append([tuple(item) for item in snapshot.pending_journal[-missing:]])
+        elif missing < 0:
+            self.journal.truncate_to(snapshot.journal_end)
+
+    def _apply(self, snapshot: _Snapshot, entry: Dict[str, Any]) -> None:
+        snapshot.wal_seq = entry["seq"]
+        if "journal" in entry:
+            snapshot.journal_end = entry["journal_from"] + len(entry["journal"])
+            snapshot.pending_journal = entry["journal"]
+        data = snapshot.data
+        kind = entry["type"]
+        if kind == "post":
+            for user_id, account_position, amount, notification in entry["postings"]:
+                user = data["users"][snapshot.positions[user_id]]
+                account = user["accounts"][account_position]
+                account["balance"] = round(account["balance"] + amount, 2)
+                if notification:
+                    push_notification(user, notification, self.notification_retention)
+            return
+        if kind == "create":
+            user = entry["user"]
+            data["next_user_id"] = max(data["next_user_id"], user["id"] + 1)
+            snapshot.positions[user["id"]] = len(data["users"])
+            data["users"].append(user)
+            snapshot.index_contact(user)
+            snapshot.index_accounts(user)
+            return
+        position = snapshot.positions.get(entry["user_id"])
+        if position is None:
+            return
+        previous = data["users"][position]
+        if kind == "notify":
+            push_notification(previous, entry["notification"], self.notification_retention)
+            return
+        if kind == "read":
+            read = previous["notifications_read"] = max(previous.get("notifications_read", 0), entry["upto"])
+            previous["unread_notifications"] = sum(
+                1 for note in previous.get("notifications", []) if note.get("id", 0) > read
+            )
+            return
+        if kind == "patch":
+            prior = {"contact": previous["contact"], "accounts": [{"iban": account["iban"]} for account in previous.get("accounts", [])]}
+            apply_patch(previous, entry["ops"])
+            snapshot.index_contact(previous, prior)
+            snapshot.index_accounts(previous, prior)
+            return
+        user = entry["user"]
+        if kind == "replace":
+            data.setdefault("history_start", {})[str(user["id"])] = entry["history_start"]
+        data["users"][position] = user
+        snapshot.index_contact(user, previous)
+        snapshot.index_accounts(user, previous)
+
+    def _log(
+        self,
+        snapshot: _Snapshot,
+        entry: Dict[str, Any],
+        journal: Optional[List[Tuple[int, Optional[str], Dict[str, Any]]]] = None,
+    ) -> int:
+        # Called inside _exclusive(): the entry is appended before it is applied, and the
+        # returned ticket is passed to _commit() once the lock has been released.
+        entry = {"seq": snapshot.wal_seq + 1, **entry}
+        if journal:
+            entry["journal_from"] = self.journal.last_seq
+            entry["journal"] = [list(item) for item in journal]
+        record = codec.dumps(entry) + b"\n"
+        ticket = self.wal.append(record)
+        if snapshot.wal_inode is None:
+            snapshot.wal_inode = self.wal.inode()
+        self._apply(snapshot, entry)
+        if journal:
+            self.journal.append(journal)
+        snapshot.wal_offset += len(record)
+        snapshot.stamp = (*snapshot.stamp[:2], snapshot.wal_offset)
+        if snapshot.wal_seq - snapshot.data.get("wal_seq", 0) >= self.checkpoint_entries:
+            self._checkpoint_wanted.set()
+        self._start_checkpointer()
+        return ticket
+
+    def _commit(self, ticket: int) -> None:
+        if self.durable:
+            self.wal.sync(ticket)
+
+    def _start_checkpointer(self) -> None:
+        if self._checkpointer is None or not self._checkpointer.is_alive():
+            self._checkpointer = threading.Thread(target=self._run_checkpointer, name="json-checkpoint", daemon=True)
+            self._checkpointer.start()
+
+    def _run_checkpointer(self) -> None:
+        while not self._closed:
+            self._checkpoint_wanted.wait(self.checkpoint_interval)
+            self._checkpoint_wanted.clear()
+            if self._closed:
+                break
+            try:
+                self.checkpoint()
+            except Exception:
+                logger.exception("JSON checkpoint failed")
+
+    def _encode(self, snapshot: _Snapshot) -> Tuple[bytes, Optional[bytes]]:
+        if "iban_index" not in snapshot.data:
+            snapshot.rebuild_iban_index()
+        snapshot.data["wal_seq"] = snapshot.wal_seq
+        snapshot.data["journal_seq"] = snapshot.journal_end = self.journal.last_seq
+        binary = codec.encode_snapshot(snapshot.data) if self.snapshot_path is not None else None
+        return codec.dumps(snapshot.data), binary
+
+    def _store(self, payload: Tuple[bytes, Optional[bytes]]) -> None:
+        # The binary copy is stamped with the JSON file it mirrors, so a crash between the
+        # two renames leaves a snapshot that is simply ignored on the next start.
+        data, binary = payload
+        replace_file(self.path, data)
+        count_io("data", "write", len(data))
+        if binary is not None and self.snapshot_path is not None:
+            stat = self.path.stat()
+            framed = codec.frame_snapshot(binary, (stat.st_mtime_ns, stat.st_size))
+            replace_file(self.snapshot_path, framed)
+            count_io("snapshot", "write", len(framed))
+
+    def checkpoint(self) -> None:
+        # Serialising happens under the shared lock; the slow part (fsync + rename) under
+        # none, and only folding the WAL makes other writers wait. Appends made meanwhile
+        # only grow the WAL (replacing it needs the checkpoint lock), so its first `folded`
+        # bytes are still exactly what the new data file contains.
+        self._recover()
+        with self._checkpoint_lock, self._checkpoint_file_lock.hold():
+            with self._lock, self._file_lock.hold(exclusive=False):
+                snapshot = self._dataset()
+                if snapshot.wal_offset == 0:
+                    return
+                self.journal.sync()
+                payload = self._encode(snapshot)
+                folded = snapshot.wal_offset
+            self._store(payload)
+            with self._lock:
+                current = self._snapshot
+                if current is not None:
+                    # Still a superset of what was just stored, so it stays valid.
+                    current.stamp = (*self._stamp()[:2], current.wal_offset)
+            with self._exclusive() as current:
+                self.wal.rewrite(folded)
+                current.wal_offset -= folded
+                current.wal_inode = self.wal.inode()
+                current.stamp = (*current.stamp[:2], current.wal_offset)
+
+    def close(self) -> None:
+        self._closed = True
+        self._checkpoint_wanted.set()
+        if self._checkpointer is not None:
+            self._checkpointer.join()
+        self.checkpoint()
+
+    def _journal_legacy_history(self, snapshot: _Snapshot) -> None:
+        history_start = snapshot.data.setdefault("history_start", {})
+        for user in snapshot.data["users"]:
+            if "transactions" not in user:
+                continue
+            if not self.journal.has_user(user["id"], after=history_start.get(str(user["id"]), 0)):
+                self._journal_user(user)
+            strip_history(user)
+        self._write(snapshot)
+
+    def _journal_user(self, user: Dict[str, Any]) -> None:
+        self.journal.append(self._history_entries(user))
+
+    @staticmethod
+    def _history_entries(user: Dict[str, Any]) -> List[Tuple[int, Optional[str], Dict[str, Any]]]:
+        return [(user["id"], iban, trx) for iban, trx in pair_transactions(user)]
+
+    def _write(self, snapshot: _Snapshot) -> None:
+        # Full rewrites (first start, legacy migration, save_data) fold the whole WAL under
+        # the exclusive lock. save_data also holds the checkpoint lock; the first-load cases
+        # run before this process could have started a checkpoint.
+        with self._lock:
+            try:
+                self.journal.sync()
+                self._store(self._encode(snapshot))
+                self.wal.rewrite(self.wal.size())
+            except BaseException:
+                self._snapshot = None
+                raise
+            snapshot.wal_offset = 0
+            snapshot.wal_inode = self.wal.inode()
+            snapshot.stamp = self._stamp()
+            self._snapshot = snapshot
+            self._indexed = True
+            self._recovered = True
+
+    def load_data(self) -> Dict[str, Any]:
+        data = copy.deepcopy(self._dataset().data)
+        for key in ("history_start", "history_generation", "wal_seq", "journal_seq"):
+            data.pop(key, None)
+        for user in data["users"]:
+            attach_history(user, list(self.transactions(user["id"])))
+        return data
+
+    def save_data(self, data: Dict[str, Any]) -> None:
+        with self._checkpoint_lock, self._checkpoint_file_lock.hold(), self._exclusive() as current:
+            previous_seq = current.wal_seq
+            snapshot = _Snapshot(None, copy.deepcopy(data))
+            snapshot.wal_seq = previous_seq
+            snapshot.rebuild_iban_index()
+            self.journal.truncate()
+            snapshot.data["history_start"] = {}
+            # The journal starts over, so transaction ids are handed out again from 1.
+            snapshot.data["history_generation"] = current.data.get("history_generation", 0) + 1
+            for user in snapshot.data["users"]:
+                self._journal_user(user)
+                strip_history(user)
+            self._write(snapshot)
+
+    def _stored_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        snapshot = self._dataset()
+        position = snapshot.positions.get(user_id)
+        return snapshot.data["users"][position] if position is not None else None
+
+    def get_user(self, user_id: int, lazy: bool = False) -> Optional[Dict[str, Any]]:
+        stored = self._stored_user(user_id)
+        if stored is None:
+            return None
+        return {
+            key: copy.deepcopy(value) for key, value in stored.items() if not (lazy and key in LAZY_SECTIONS)
+        }
+
+    def user_section(self, user_id: int, section: str) -> List[Dict[str, Any]]:
+        stored = self._stored_user(user_id)
+        return copy.deepcopy(stored.get(section, [])) if stored is not None else []
+
+    def find_user_id_by_contact(self, contact: str) -> Optional[int]:
+        return self._dataset().contacts.get(normalize_contact(contact))
+
+    def locate_iban(self, iban: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            return self._locate(self._dataset(), iban)
+
+    def locate_ibans(self, ibans: Collection[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        with self._lock:
+            snapshot = self._dataset()
+            return {iban: self._locate(snapshot, iban) for iban in ibans}
+
+    @staticmethod
+    def _locate(snapshot: _Snapshot, iban: str) -> Optional[Tuple[int, int]]:
+        entry = snapshot.ibans.get(iban)
+        if entry is None:
+            return None
+        user_id, account_position = entry
+        position = snapshot.positions.get(user_id)
+        accounts = snapshot.data["users"][position].get("accounts", []) if position is not None else []
+        if account_position >= len(accounts) or accounts[account_position].get("iban") != iban:
+            snapshot.rebuild_iban_index()
+            entry = snapshot.ibans.get(iban)
+        return (entry[0], entry[1]) if entry else None
+
+    def revision(self) -> Any:
+        return self._stamp()
+
+    def user_version(self, user_id: int) -> Any:
+        with self._lock:
+            snapshot = self._dataset()
+            return snapshot.stamp if user_id in snapshot.positions else None
+
+    def history_revision(self, user_id: int) -> Any:
+        history_start = self._dataset().data.get("history_start", {}).get(str(user_id), 0)
+        return history_start, self.journal.last_user_seq(user_id)
+
+    def history_generation(self, user_id: int) -> Any:
+        data = self._dataset().data
+        return data.get("history_generation", 0), data.get("history_start", {}).get(str(user_id), 0)
+
+    def create_user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        with self._exclusive() as snapshot:
+            data = snapshot.data
+            if normalize_contact(user["contact"]) in snapshot.contacts:
+                raise DuplicateContactError(user["contact"])
+            user["id"] = data["next_user_id"]
+            number_notifications(user)
+            ticket = self._log(
+                snapshot,
+                {"type": "create", "user": strip_history(copy.deepcopy(user))},
+                journal=self._history_entries(user),
+            )
+        self._commit(ticket)
+        return user
+
+    def save_user(self, user: Dict[str, Any]) -> None:
+        with self._exclusive() as snapshot:
+            position = snapshot.positions.get(user["id"])
+            if position is None:
+                return
+            previous = snapshot.data["users"][position]
+            owner = snapshot.contacts.get(normalize_contact(user["contact"]))
+            if owner is not None and owner != user["id"]:
+                raise DuplicateContactError(user["contact"])
+            merged = strip_history(copy.deepcopy(user))
+            # Balances and notifications are only ever changed through post(), so a stale
+            # profile save cannot roll back a concurrent transfer. Lazy sections the caller
+            # never loaded are carried over untouched.
+            for section in LAZY_SECTIONS:
+                if section in LEDGER_SECTIONS or section not in merged:
+                    merged[section] = previous.get(section, [])
+            for field in NOTIFICATION_STATE_FIELDS:
+                if field in previous:
+                    merged[field] = previous[field]
+            previous_accounts = {account["iban"]: account for account in previous.get("accounts", [])}
+            for account in merged.get("accounts", []):
+                if account["iban"] in previous_accounts:
+                    account["balance"] = previous_accounts[account["iban"]]["balance"]
+            ticket = self._log(snapshot, {"type": "save", "user_id": user["id"], "user": merged})
+        self._commit(ticket)
+
+    def patch_user(self, user_id: int, ops: List[Dict[str, Any]]) -> None:
+        with self._exclusive() as snapshot:
+            position = snapshot.positions.get(user_id)
+            if position is None:
+                return
+            user = snapshot.data["users"][position]
+            ops = ledger_safe_ops(user, ops)
+            if not ops:
+                return
+            for op in ops:
+                if op["path"] == "/contact":
+                    owner = snapshot.contacts.get(normalize_contact(op["value"]))
+                    if owner is not None and owner != user_id:
+                        raise DuplicateContactError(op["value"])
+            ticket = self._log(snapshot, {"type": "patch", "user_id": user_id, "ops": ops})
+        self._commit(ticket)
+
+    def replace_user(self, user: Dict[str, Any]) -> None:
+        with self._exclusive() as snapshot:
+            position = snapshot.positions.get(user["id"])
+            if position is None:
+                return
+            owner = snapshot.contacts.get(normalize_contact(user["contact"]))
+            if owner is not None and owner != user["id"]:
+                raise DuplicateContactError(user["contact"])
+            number_notifications(user, snapshot.data["users"][position].get("notification_seq", 0))
+            # The journal is append-only, so a reset hides the earlier history instead of deleting it.
+            ticket = self._log(
+                snapshot,
+                {
+                    "type": "replace",
+                    "user_id": user["id"],
+                    "user": strip_history(copy.deepcopy(user)),
+                    "history_start": self.journal.last_seq,
+                },
+                journal=self._history_entries(user),
+            )
+        self._commit(ticket)
+
+    def post(self, postings: List[Posting]) -> List[int]:
+        check_postings(postings)
+        # One writer at a time for the whole store, not per account: only the funds check
+        # and the WAL append run under the lock, the fsync is shared outside it.
+        with self._exclusive() as snapshot:
+            resolved = []
+            totals: Dict[str, float] = {}
+            for posting in postings:
+                located = self.locate_iban(posting.iban)
+                if located is None:
+                    raise UnknownAccountError(posting.iban)
+                user = snapshot.data["users"][snapshot.positions[located[0]]]
+                resolved.append((posting, user, located[1], user["accounts"][located[1]]))
+                totals[posting.iban] = totals.get(posting.iban, 0) + posting.amount
+            for _, _, _, account in resolved:
+                total = totals[account["iban"]]
+                if total < 0 and round(account["balance"] + total, 2) < 0:
+                    raise InsufficientFundsError(account["iban"])
+            ticket = self._log(
+                snapshot,
+                {
+                    "type": "post",
+                    "postings": [
+                        [user["id"], position, posting.amount, posting.notification]
+                        for posting, user, position, _ in resolved
+                    ],
+                },
+                journal=[(user["id"], account["iban"], posting.transaction) for posting, user, _, account in resolved],
+            )
+            touched: List[int] = []
+            for _, user, _, _ in resolved:
+                if user["id"] not in touched:
+                    touched.append(user["id"])
+        self._commit(ticket)
+        return touched
+
+    def notify(self, user_id: int, notification: Dict[str, Any]) -> None:
+        with self._exclusive() as snapshot:
+            if user_id not in snapshot.positions:
+                return
+            ticket = self._log(snapshot, {"type": "notify", "user_id": user_id, "notification": notification})
+        self._commit(ticket)
+
+    def notifications(self, user_id: int, after: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            stored = self._stored_user(user_id)
+            if stored is None:
+                return []
+            # Notifications written before ids existed count as id 0: part of the feed, never "new".
+            notes: Iterable[Dict[str, Any]] = stored.get("notifications", [])
+            if after is not None:
+                notes = takewhile(lambda note: note.get("id", 0) > after, notes)
+            return [{"id": 0, **note} for note in islice(notes, limit)]
+
+    def notification_state(self, user_id: int) -> Tuple[int, int]:
+        with self._lock:
+            stored = self._stored_user(user_id)
+            if stored is None:
+                return 0, 0
+            return stored.get("notification_seq", 0), stored.get("unread_notifications", 0)
+
+    def mark_notifications_read(self, user_id: int, upto: int) -> None:
+        with self._exclusive() as snapshot:
+            position = snapshot.positions.get(user_id)
+            if position is None or upto <= snapshot.data["users"][position].get("notifications_read", 0):
+                return
+            ticket = self._log(snapshot, {"type": "read", "user_id": user_id, "upto": upto})
+        self._commit(ticket)
+
+    def due_autopays(self, month: str) -> List[Tuple[int, int, Dict[str, Any]]]:
+        with self._lock:
+            return [
+                (user["id"], position, dict(payment))
+                for user in self._dataset().data["users"]
+                for position, payment in enumerate(user.get("payments", []))
+                if autopay_due(payment, month)
+            ]
+
+    def transactions(
+        self,
+        user_id: int,
+        iban: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: Optional[int] = None,
+        channels: Optional[Collection[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        after: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # Rows at or below history_start belong to a history that was since replaced; `after`
+        # lets incremental readers fetch only what was posted since their last visit.
+        history_start = self._dataset().data.get("history_start", {}).get(str(user_id), 0)
+        after = max(history_start, after or 0)
+        history = self.journal.iter(
+            user_id=user_id,
+            iban=iban,
+            before=before,
+            after=after,
+            channels=channels,
+            date_from=date_from,
+            date_until=day_after(date_to) if date_to else None,
+        )
+        return islice(history, limit)
+
+    def billers(self) -> List[Dict[str, Any]]:
+        return copy.deepcopy(self._dataset().data["billers"])
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('history_generation', 0);
+CREATE TABLE IF NOT EXISTS billers (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    contact_key TEXT UNIQUE,
+    contact_type TEXT NOT NULL,
+    biometric_enabled INTEGER NOT NULL DEFAULT 0,
+    kyc_status TEXT NOT NULL DEFAULT 'pending',
+    language TEXT NOT NULL DEFAULT 'tr',
+    theme TEXT NOT NULL DEFAULT 'light',
+    notifications_enabled INTEGER NOT NULL DEFAULT 1,
+    version INTEGER NOT NULL DEFAULT 0,
+    notifications_read INTEGER NOT NULL DEFAULT 0,
+    unread_notifications INTEGER NOT NULL DEFAULT 0,
+    notification_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    iban TEXT NOT NULL UNIQUE,
+    balance REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS accounts_by_user ON accounts(user_id, position);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    account_id INTEGER REFERENCES accounts(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    channel TEXT NOT NULL,
+    counterparty TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_by_user ON transactions(user_id, id);
+CREATE INDEX IF NOT EXISTS transactions_by_account ON transactions(account_id, id);
+CREATE TABLE IF NOT EXISTS cards (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    last4 TEXT NOT NULL,
+    type TEXT NOT NULL,
+    spend NUMERIC NOT NULL DEFAULT 0,
+    limit_amount NUMERIC NOT NULL DEFAULT 0,
+    frozen INTEGER NOT NULL DEFAULT 0,
+    contactless INTEGER NOT NULL DEFAULT 0,
+    ecommerce INTEGER NOT NULL DEFAULT 0,
+    international INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    biller TEXT,
+    subscriber TEXT,
+    customer_no TEXT NOT NULL DEFAULT '',
+    autopay INTEGER NOT NULL DEFAULT 0,
+    amount REAL,
+    last_paid TEXT
+);
+CREATE INDEX IF NOT EXISTS payments_by_user ON payments(user_id, position);
+CREATE INDEX IF NOT EXISTS payments_autopay ON payments(user_id, position) WHERE autopay = 1;
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS notifications_by_user ON notifications(user_id, id);
+CREATE TABLE IF NOT EXISTS support_messages (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    sender TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS support_messages_by_user ON support_messages(user_id, id);
+"""
+
+
+def _new_tail(current: List[Any], stored: List[Any]) -> Optional[List[Any]]:
+    if len(current) < len(stored) or current[: len(stored)] != stored:
+        return None
+    return current[len(stored):]
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: Union[str, Path], notification_retention: int = NOTIFICATION_RETENTION) -> None:
+        self.path = Path(path)
+        self.notification_retention = notification_retention
+        self._local = threading.local()
+        self.conn.executescript(SQLITE_SCHEMA)
+        self._migrate_schema()
+        with self._transaction() as conn:
+            if conn.execute("SELECT COUNT(*) FROM billers").fetchone()[0] == 0:
+                self._insert_billers(conn, DEFAULT_DATA["billers"])
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection must not cross a fork (gunicorn --preload opens storage in the master).
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate_schema(self) -> None:
+        # Worker processes may open the database at the same time; checking and altering in
+        # one write transaction makes sure only the first of them migrates.
+        with self._transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(users)")}
+            if "version" not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if "contact_key" not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN contact_key TEXT")
+                conn.executemany(
+                    "UPDATE users SET contact_key = ? WHERE id = ?",
+                    [(normalize_contact(row["contact"]), row["id"]) for row in conn.execute("SELECT id, contact FROM users")],
+                )
+                conn.execute("CREATE UNIQUE INDEX users_by_contact_key ON users(contact_key)")
+            if "notifications_read" not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN notifications_read INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE users ADD COLUMN unread_notifications INTEGER NOT NULL DEFAULT 0")
+            if "notification_seq" not in columns:
+                # Feed ids used to be global rowids; each user's retained notifications are
+                # renumbered 1..n and the read marker moved onto the new numbering.
+                conn.execute("ALTER TABLE users ADD COLUMN notification_seq INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE notifications ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+                conn.execute(
+                    "UPDATE notifications SET seq = (SELECT COUNT(*) FROM notifications AS earlier"
+                    " WHERE earlier.user_id = notifications.user_id AND earlier.id <= notifications.id)"
+                )
+                conn.execute(
+                    "UPDATE users SET notifications_read = (SELECT COUNT(*) FROM notifications"
+                    " WHERE user_id = users.id AND id <= users.notifications_read),"
+                    " notification_seq = (SELECT COUNT(*) FROM notifications WHERE user_id = users.id)"
+                )
+            conn.execute("CREATE INDEX IF NOT EXISTS notifications_by_user_seq ON notifications(user_id, seq)")
+            # History pages walk (account_id, id) newest first; the date index was never chosen.
+            conn.execute("DROP INDEX IF EXISTS transactions_by_account_date")
+            payment_columns = {row["name"] for row in conn.execute("PRAGMA table_info(payments)")}
+            if "amount" not in payment_columns:
+                conn.execute("ALTER TABLE payments ADD COLUMN amount REAL")
+                conn.execute("ALTER TABLE payments ADD COLUMN last_paid TEXT")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _bump_history_generation(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'history_generation'")
+
+    def _bump_revision(self, conn: sqlite3.Connection, user_id: Optional[int] = None) -> int:
+        # User versions are drawn from the global revision so a deleted and re-created
+        # user can never reuse a version that a cache might still hold.
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+        if user_id is not None:
+            conn.execute("UPDATE users SET version = ? WHERE id = ?", (revision, user_id))
+        return revision
+
+    def load_data(self) -> Dict[str, Any]:
+        conn = self.conn
+        user_ids = [row["id"] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'users'").fetchone()
+        return {
+            "next_user_id": (sequence["seq"] if sequence else 0) + 1,
+            "users": [
+                attach_history(self._read_user(conn, user_id), list(self.transactions(user_id)))
+                for user_id in user_ids
+            ],
+            "billers": self.billers(),
+        }
+
+    def save_data(self, data: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            for table in ("support_messages", "notifications", "payments", "cards", "transactions", "accounts", "users", "billers"):
+                conn.execute(f"DELETE FROM {table}")
+            self._insert_billers(conn, data.get("billers", []))
+            for user in data.get("users", []):
+                self._insert_user(conn, user)
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'users'")
+            conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('users', ?)",
+                (max(data.get("next_user_id", 1) - 1, 0),),
+            )
+            revision = self._bump_revision(conn)
+            conn.execute("UPDATE users SET version = ?", (revision,))
+            self._bump_history_generation(conn)
+
+    def get_user(self, user_id: int, lazy: bool = False) -> Optional[Dict[str, Any]]:
+        return self._read_user(self.conn, user_id, lazy=lazy)
+
+    def user_section(self, user_id: int, section: str) -> List[Dict[str, Any]]:
+        return self._read_section(self.conn, user_id, section)
+
+    def find_user_id_by_contact(self, contact: str) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT id FROM users WHERE contact_key = ?", (normalize_contact(contact),)
+        ).fetchone()
+        return row["id"] if row else None
+
+    def locate_iban(self, iban: str) -> Optional[Tuple[int, int]]:
+        row = self.conn.execute(
+            "SELECT user_id, position FROM accounts WHERE iban = ?", (iban,)
+        ).fetchone()
+        return (row["user_id"], row["position"]) if row else None
+
+    def locate_ibans(self, ibans: Collection[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        located: Dict[str, Optional[Tuple[int, int]]] = dict.fromkeys(ibans)
+        pending = list(located)
+        # Chunked to stay under SQLite's bound-parameter limit.
+        for start in range(0, len(pending), 500):
+            chunk = pending[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT iban, user_id, position FROM accounts WHERE iban IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for row in rows:
+                located[row["iban"]] = (row["user_id"], row["position"])
+        return located
+
+    def revision(self) -> Any:
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+    def user_version(self, user_id: int) -> Any:
+        row = self.conn.execute("SELECT version FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row["version"] if row else None
+
+    def history_generation(self, user_id: int) -> Any:
+        # Bumped for every replaced history; resets are rare, so one counter for all users will do.
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'history_generation'").fetchone()[0]
+
+    def history_revision(self, user_id: int) -> Any:
+        row = self.conn.execute(
+            "SELECT COUNT(*) AS count, MAX(id) AS last FROM transactions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row["count"], row["last"]
+
+    def create_user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            user.pop("id", None)
+            user["id"] = self._insert_user(conn, user)
+            self._bump_revision(conn, user["id"])
+        return user
+
+    def save_user(self, user: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            stored = self._read_user(conn, user["id"], lazy=True)
+            if stored is None:
+                return
+            self._update_profile(conn, user, stored)
+            self._update_accounts(conn, user, stored)
+            self._update_cards(conn, user, stored)
+            self._update_payments(conn, user, stored)
+            if "support_messages" in user:
+                self._update_support_messages(conn, user)
+            self._bump_revision(conn, user["id"])
+
+    def patch_user(self, user_id: int, ops: List[Dict[str, Any]]) -> None:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is None:
+                return
+            if all(self._row_patchable(op) for op in ops):
+                self._patch_rows(conn, user_id, ops)
+            else:
+                # Anything positional on accounts or support history goes through the same
+                # diff as save_user, still inside this transaction.
+                stored = self._read_user(conn, user_id)
+                user = apply_patch(copy.deepcopy(stored), ledger_safe_ops(stored, ops))
+                self._update_profile(conn, user, stored)
+                self._update_accounts(conn, user, stored)
+                self._update_cards(conn, user, stored)
+                self._update_payments(conn, user, stored)
+                self._update_support_messages(conn, user)
+            self._bump_revision(conn, user_id)
+
+    def replace_user(self, user: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT notification_seq FROM users WHERE id = ?", (user["id"],)).fetchone()
+            number_notifications(user, row["notification_seq"] if row else 0)
+            self._delete_user(conn, user["id"])
+            self._insert_user(conn, user)
+            self._bump_history_generation(conn)
+            self._bump_revision(conn, user["id"])
+
+    def post(self, postings: List[Posting]) -> List[int]:
+        # Every balance moves through a single conditional UPDATE, so the funds check and
+        # the debit are one atomic step and concurrent writers can never overdraw. SQLite
+        # still admits one write transaction at a time, so postings do not run in parallel.
+        check_postings(postings)
+        touched: List[int] = []
+        with self._transaction() as conn:
+            for posting in postings:
+                row = conn.execute(
+                    "SELECT id, user_id FROM accounts WHERE iban = ?", (posting.iban,)
+                ).fetchone()
+                if row is None:
+                    raise UnknownAccountError(posting.iban)
+                updated = conn.execute(
+                    "UPDATE accounts SET balance = round(balance + ?, 2)"
+                    " WHERE id = ? AND (? >= 0 OR round(balance + ?, 2) >= 0)",
+                    (posting.amount, row["id"], posting.amount, posting.amount),
+                )
+                if updated.rowcount == 0:
+                    raise InsufficientFundsError(posting.iban)
+                self._insert_transactions(conn, row["user_id"], [(row["id"], posting.transaction)])
+                if posting.notification:
+                    self._push_notification(conn, row["user_id"], posting.notification)
+                if row["user_id"] not in touched:
+                    touched.append(row["user_id"])
+            for user_id in touched:
+                self._bump_revision(conn, user_id)
+        return touched
+
+    def notify(self, user_id: int, notification: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is None:
+                return
+            self._push_notification(conn, user_id, notification)
+            self._bump_revision(conn, user_id)
+
+    def notifications(self, user_id: int, after: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = "SELECT seq AS id, title, timestamp FROM notifications WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if after is not None:
+            query += " AND seq > ?"
+            params.append(after)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def notification_state(self, user_id: int) -> Tuple[int, int]:
+        row = self.conn.execute(
+            "SELECT notification_seq, unread_notifications FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        return (row["notification_seq"], row["unread_notifications"]) if row else (0, 0)
+
+    def mark_notifications_read(self, user_id: int, upto: int) -> None:
+        # Not a profile change, so the user version stays put and cached records stay valid.
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE users SET notifications_read = ?,"
+                " unread_notifications = (SELECT COUNT(*) FROM notifications WHERE user_id = users.id AND seq > ?)"
+                " WHERE id = ? AND notifications_read < ?",
+                (upto, upto, user_id, upto),
+            )
+
+    def due_autopays(self, month: str) -> List[Tuple[int, int, Dict[str, Any]]]:
+        rows = self.conn.execute(
+            "SELECT * FROM payments WHERE autopay = 1 AND amount > 0"
+            " AND (last_paid IS NULL OR substr(last_paid, 1, 7) < ?) ORDER BY user_id, position",
+            (month,),
+        )
+        return [(row["user_id"], row["position"], self._payment_from_row(row)) for row in rows]
+
+    def transactions(
+        self,
+        user_id: int,
+        iban: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: Optional[int] = None,
+        channels: Optional[Collection[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        after: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        query = (
+            "SELECT t.id, a.iban, t.date, t.description, t.amount, t.channel, t.counterparty"
+            " FROM transactions t LEFT JOIN accounts a ON a.id = t.account_id"
+        )
+        if iban is not None:
+            query += " WHERE t.account_id = (SELECT id FROM accounts WHERE iban = ?) AND t.user_id = ?"
+            params: List[Any] = [iban, user_id]
+        else:
+            query += " WHERE t.user_id = ?"
+            params = [user_id]
+        if before is not None:
+            query += " AND t.id < ?"
+            params.append(before)
+        if after is not None:
+            query += " AND t.id > ?"
+            params.append(after)
+        if channels:
+            query += f" AND t.channel IN ({', '.join('?' * len(channels))})"
+            params.extend(channels)
+        if date_from:
+            query += " AND t.date >= ?"
+            params.append(date_from)
+        if date_to:
+            query += " AND t.date < ?"
+            params.append(day_after(date_to))
+        query += " ORDER BY t.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self.conn.execute(query, params):
+            yield dict(row)
+
+    def billers(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": row["id"], "name": row["name"]}
+            for row in self.conn.execute("SELECT id, name FROM billers ORDER BY position")
+        ]
+
+    def _insert_billers(self, conn: sqlite3.Connection, billers: List[Dict[str, Any]]) -> None:
+        conn.executemany(
+            "INSERT INTO billers (id, position, name) VALUES (?, ?, ?)",
+            [(biller["id"], position, biller["name"]) for position, biller in enumerate(billers)],
+        )
+
+    def _read_user(self, conn: sqlite3.Connection, user_id: int, lazy: bool = False) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user: Dict[str, Any] = {"id": row["id"]}
+        for field in PROFILE_FIELDS:
+            user[field] = bool(row[field]) if field in BOOLEAN_PROFILE_FIELDS else row[field]
+
+        user["accounts"] = [
+            {"name": account_row["name"], "iban": account_row["iban"], "balance": account_row["balance"]}
+            for account_row in conn.execute(
+                "SELECT name, iban, balance FROM accounts WHERE user_id = ? ORDER BY position", (user_id,)
+            )
+        ]
+        user["cards"] = [
+            {
+                "id": card_row["id"],
+                "name": card_row["name"],
+                "last4": card_row["last4"],
+                "type": card_row["type"],
+                "spend": card_row["spend"],
+                "limit": card_row["limit_amount"],
+                "frozen": bool(card_row["frozen"]),
+                "settings": {setting: bool(card_row[setting]) for setting in CARD_SETTINGS},
+            }
+            for card_row in conn.execute(
+                "SELECT * FROM cards WHERE user_id = ? ORDER BY position", (user_id,)
+            )
+        ]
+        user["payments"] = [
+            self._payment_from_row(payment_row)
+            for payment_row in conn.execute(
+                "SELECT * FROM payments WHERE user_id = ? ORDER BY position", (user_id,)
+            )
+        ]
+        if not lazy:
+            for section in LAZY_SECTIONS:
+                user[section] = self._read_section(conn, user_id, section)
+        return user
+
+    def _read_section(self, conn: sqlite3.Connection, user_id: int, section: str) -> List[Dict[str, Any]]:
+        if section == "notifications":
+            return [
+                {"title": note_row["title"], "timestamp": note_row["timestamp"], "id": note_row["seq"]}
+                for note_row in conn.execute(
+                    "SELECT title, timestamp, seq FROM notifications WHERE user_id = ? ORDER BY seq DESC", (user_id,)
+                )
+            ]
+        if section == "support_messages":
+            return [
+                {"sender": msg_row["sender"], "message": msg_row["message"], "timestamp": msg_row["timestamp"]}
+                for msg_row in conn.execute(
+                    "SELECT sender, message, timestamp FROM support_messages WHERE user_id = ? ORDER BY id",
+                    (user_id,),
+                )
+            ]
+        raise KeyError(section)
+
+    def _insert_user(self, conn: sqlite3.Connection, user: Dict[str, Any]) -> int:
+        columns = ["id", "contact_key", *PROFILE_FIELDS]
+        try:
+            cursor = conn.execute(
+                f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [user.get("id"), normalize_contact(user["contact"])] + [user.get(field) for field in PROFILE_FIELDS],
+            )
+        except sqlite3.IntegrityError as exc:
+            if "contact_key" in str(exc):
+                raise DuplicateContactError(user["contact"]) from exc
+            raise
+        user_id = cursor.lastrowid
+        for position, account in enumerate(user.get("accounts", [])):
+            self._insert_account(conn, user_id, position, account)
+        account_ids = self._account_ids(conn, user_id)
+        self._insert_transactions(
+            conn, user_id, [(account_ids.get(iban), trx) for iban, trx in pair_transactions(user)]
+        )
+        for position, card in enumerate(user.get("cards", [])):
+            self._insert_card(conn, user_id, position, card)
+        for position, payment in enumerate(user.get("payments", [])):
+            self._insert_payment(conn, user_id, position, payment)
+        number_notifications(user)
+        conn.execute(
+            "UPDATE users SET notification_seq = ?, notifications_read = ?, unread_notifications = ? WHERE id = ?",
+            [user.get(field, 0) for field in NOTIFICATION_STATE_FIELDS] + [user_id],
+        )
+        self._insert_notifications(conn, user_id, user.get("notifications", [])[: self.notification_retention])
+        self._insert_support_messages(conn, user_id, user.get("support_messages", []))
+        return user_id
+
+    def _delete_user(self, conn: sqlite3.Connection, user_id: int) -> None:
+        for table in ("support_messages", "notifications", "payments", "cards", "transactions", "accounts"):
+            conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+    def _insert_account(
+        self, conn: sqlite3.Connection, user_id: int, position: int, account: Dict[str, Any]
+    ) -> int:
+        cursor = conn.execute(
+            "INSERT INTO accounts (user_id, position, name, iban, balance) VALUES (?, ?, ?, ?, ?)",
+            (user_id, position, account["name"], account["iban"], account.get("balance", 0)),
+        )
+        return cursor.lastrowid
+
+    def _account_ids(self, conn: sqlite3.Connection, user_id: int) -> Dict[str, int]:
+        return {
+            row["iban"]: row["id"]
+            for row in conn.execute("SELECT id, iban FROM accounts WHERE user_id = ?", (user_id,))
+        }
+
+    def _insert_transactions(
+        self,
+        conn: sqlite3.Connection,
+        user_id: int,
+        paired: List[Tuple[Optional[int], Dict[str, Any]]],
+    ) -> None:
+        conn.executemany(
+            "INSERT INTO transactions (user_id, account_id, date, description, amount, channel, counterparty)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (user_id, account_id, *(trx.get(field) for field in TRANSACTION_FIELDS))
+                for account_id, trx in paired
+            ],
+        )
+
+    def _insert_card(self, conn: sqlite3.Connection, user_id: int, position: int, card: Dict[str, Any]) -> None:
+        settings = card.get("settings", {})
+        conn.execute(
+            "INSERT INTO cards (user_id, id, position, name, last4, type, spend, limit_amount, frozen,"
+            " contactless, ecommerce, international) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                card["id"],
+                position,
+                card["name"],
+                card["last4"],
+                card["type"],
+                card.get("spend", 0),
+                card.get("limit", 0),
+                card.get("frozen", False),
+                *(settings.get(setting, False) for setting in CARD_SETTINGS),
+            ),
+        )
+
+    def _insert_payment(
+        self, conn: sqlite3.Connection, user_id: int, position: int, payment: Dict[str, Any]
+    ) -> None:
+        conn.execute(
+            "INSERT INTO payments (user_id, position, biller, subscriber, customer_no, autopay, amount, last_paid)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                position,
+                payment.get("biller"),
+                payment.get("subscriber"),
+                payment.get("customer_no", ""),
+                payment.get("autopay", False),
+                payment.get("amount"),
+                payment.get("last_paid"),
+            ),
+        )
+
+    @staticmethod
+    def _payment_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        payment = {
+            "biller": row["biller"],
+            "subscriber": row["subscriber"],
+            "customer_no": row["customer_no"],
+            "autopay": bool(row["autopay"]),
+        }
+        # Payments made before amounts were recorded keep the original four keys.
+        for key in ("amount", "last_paid"):
+            if row[key] is not None:
+                payment[key] = row[key]
+        return payment
+
+    def _insert_notifications(
+        self, conn: sqlite3.Connection, user_id: int, notifications: List[Dict[str, Any]]
+    ) -> None:
+        conn.executemany(
+            "INSERT INTO notifications (user_id, title, timestamp, seq) VALUES (?, ?, ?, ?)",
+            [(user_id, note["title"], note["timestamp"], note.get("id", 0)) for note in reversed(notifications)],
+        )
+
+    def _push_notification(self, conn: sqlite3.Connection, user_id: int, notification: Dict[str, Any]) -> None:
+        # Same ring buffer as push_notification(): rows past the retention are deleted as new
+        # ones arrive, and the unread counter is adjusted rather than recounted.
+        conn.execute(
+            "UPDATE users SET notification_seq = notification_seq + 1,"
+            " unread_notifications = min(unread_notifications + 1, ?) WHERE id = ?",
+            (self.notification_retention, user_id),
+        )
+        seq = conn.execute("SELECT notification_seq FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+        self._insert_notifications(conn, user_id, [{**notification, "id": seq}])
+        conn.execute(
+            "DELETE FROM notifications WHERE user_id = ? AND seq <= ("
+            "SELECT seq FROM notifications WHERE user_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (user_id, user_id, self.notification_retention),
+        )
+
+    def _insert_support_messages(
+        self, conn: sqlite3.Connection, user_id: int, messages: List[Dict[str, Any]]
+    ) -> None:
+        conn.executemany(
+            "INSERT INTO support_messages (user_id, sender, message, timestamp) VALUES (?, ?, ?, ?)",
+            [(user_id, msg["sender"], msg["message"], msg["timestamp"]) for msg in messages],
+        )
+
+    @staticmethod
+    def _row_patchable(op: Dict[str, Any]) -> bool:
+        name, index = patch_target(op["path"])
+        if index is None:
+            return name in PROFILE_FIELDS
+        if name in ("cards", "payments") or name in LEDGER_SECTIONS:
+            return True
+        return name == "support_messages" and op["op"] == "add" and index == "-"
+
+    def _patch_rows(self, conn: sqlite3.Connection, user_id: int, ops: List[Dict[str, Any]]) -> None:
+        changed: Dict[str, Any] = {}
+        for op in ops:
+            name, index = patch_target(op["path"])
+            if index is None:
+                changed[name] = op["value"]
+            elif name == "support_messages":
+                self._insert_support_messages(conn, user_id, [op["value"]])
+            elif name in ("cards", "payments"):
+                if index == "-":
+                    index = conn.execute(f"SELECT COUNT(*) FROM {name} WHERE user_id = ?", (user_id,)).fetchone()[0]
+                if name == "cards" and op["op"] != "remove":
+                    conn.execute(
+                        "DELETE FROM cards WHERE user_id = ? AND (position = ? OR id = ?)",
+                        (user_id, index, op["value"]["id"]),
+                    )
+                else:
+                    conn.execute(f"DELETE FROM {name} WHERE user_id = ? AND position = ?", (user_id, index))
+                if op["op"] != "remove":
+                    insert = self._insert_card if name == "cards" else self._insert_payment
+                    insert(conn, user_id, index, op["value"])
+        self._set_profile(conn, user_id, changed)
+
+    def _set_profile(self, conn: sqlite3.Connection, user_id: int, changed: Dict[str, Any]) -> None:
+        if "contact" in changed:
+            changed["contact_key"] = normalize_contact(changed["contact"])
+        if changed:
+            try:
+                conn.execute(
+                    f"UPDATE users SET {', '.join(f'{field} = ?' for field in changed)} WHERE id = ?",
+                    [*changed.values(), user_id],
+                )
+            except sqlite3.IntegrityError as exc:
+                raise DuplicateContactError(changed.get("contact", "")) from exc
+
+    def _update_profile(self, conn: sqlite3.Connection, user: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        changed = {field: user.get(field) for field in PROFILE_FIELDS if user.get(field) != stored.get(field)}
+        self._set_profile(conn, user["id"], changed)
+
+    def _update_accounts(self, conn: sqlite3.Connection, user: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        # Balances and histories belong to the ledger (see post); only account metadata is saved here.
+        user_id = user["id"]
+        stored_accounts = {account["iban"]: (position, account) for position, account in enumerate(stored["accounts"])}
+        account_ids = self._account_ids(conn, user_id)
+        for position, account in enumerate(user.get("accounts", [])):
+            previous = stored_accounts.pop(account["iban"], None)
+            if previous is None:
+                account_id = self._insert_account(conn, user_id, position, account)
+                self._insert_transactions(
+                    conn,
+                    user_id,
+                    [(account_id, trx) for trx in reversed(account.get("transactions", []))],
+                )
+                continue
+            stored_position, stored_account = previous
+            if stored_position != position or stored_account["name"] != account["name"]:
+                conn.execute(
+                    "UPDATE accounts SET position = ?, name = ? WHERE id = ?",
+                    (position, account["name"], account_ids[account["iban"]]),
+                )
+        for iban in stored_accounts:
+            conn.execute("DELETE FROM transactions WHERE account_id = ?", (account_ids[iban],))
+            conn.execute("DELETE FROM accounts WHERE id = ?", (account_ids[iban],))
+
+    def _update_cards(self, conn: sqlite3.Connection, user: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        user_id = user["id"]
+        stored_cards = {card["id"]: (position, card) for position, card in enumerate(stored["cards"])}
+        for position, card in enumerate(user.get("cards", [])):
+            previous = stored_cards.pop(card["id"], None)
+            if previous == (position, card):
+                continue
+            if previous is not None:
+                conn.execute("DELETE FROM cards WHERE user_id = ? AND id = ?", (user_id, card["id"]))
+            self._insert_card(conn, user_id, position, card)
+        for card_id in stored_cards:
+            conn.execute("DELETE FROM cards WHERE user_id = ? AND id = ?", (user_id, card_id))
+
+    def _update_payments(self, conn: sqlite3.Connection, user: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        user_id = user["id"]
+        payments = user.get("payments", [])
+        for position, payment in enumerate(payments):
+            if position < len(stored["payments"]):
+                if stored["payments"][position] == payment:
+                    continue
+                conn.execute(
+                    "DELETE FROM payments WHERE user_id = ? AND position = ?", (user_id, position)
+                )
+            self._insert_payment(conn, user_id, position, payment)
+        if len(payments) < len(stored["payments"]):
+            conn.execute(
+                "DELETE FROM payments WHERE user_id = ? AND position >= ?", (user_id, len(payments))
+            )
+
+    def _update_support_messages(self, conn: sqlite3.Connection, user: Dict[str, Any]) -> None:
+        messages = user.get("support_messages", [])
+        tail = _new_tail(messages, self._read_section(conn, user["id"], "support_messages"))
+        if tail is None:
+            conn.execute("DELETE FROM support_messages WHERE user_id = ?", (user["id"],))
+            tail = messages
+        self._insert_support_messages(conn, user["id"], tail)
+
+
+def open_storage(path: Union[str, Path], notification_retention: int = NOTIFICATION_RETENTION) -> Storage:
+    path = Path(path)
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteStorage(path, notification_retention=notification_retention)
+    return JsonStorage(path, notification_retention=notification_retention)
+
+
+def migrate_json_to_sqlite(json_path: Union[str, Path], db_path: Union[str, Path]) -> int:
+    data = JsonStorage(json_path).load_data()
+    target = SQLiteStorage(db_path)
+    target.save_data(data)
+    return len(data.get("users", []))
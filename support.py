@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import codec
+
+# A message lands in the user's latest thread unless that thread has been quiet this long.
+SUPPORT_THREAD_IDLE = 24 * 3600.0
+# Threads quiet for this long are compressed into a single blob and their rows dropped.
+SUPPORT_ARCHIVE_AFTER = 30 * 24 * 3600.0
+SUBJECT_LENGTH = 80
+
+SUPPORT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    subject TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL DEFAULT 'open',
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    archive BLOB
+);
+CREATE INDEX IF NOT EXISTS conversations_by_user ON conversations(user_id, id);
+CREATE INDEX IF NOT EXISTS conversations_idle ON conversations(state, updated);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    sender TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages(conversation_id, id);
+"""
+
+MESSAGE_FIELDS = ("id", "sender", "message", "timestamp")
+
+
+class UnknownConversationError(LookupError):
+    pass
+
+
+def _pack(rows: List[Tuple[Any, ...]]) -> bytes:
+    return zlib.compress(codec.dumps([list(row) for row in rows]), 6)
+
+
+def _unpack(blob: bytes) -> List[Dict[str, Any]]:
+    return [dict(zip(MESSAGE_FIELDS, row)) for row in codec.loads(zlib.decompress(blob))]
+
+
+class SupportStore:
+    # Support chats live in their own SQLite file instead of on the user record, so a long
+    # conversation never rides along with unrelated profile reads and writes. Messages are
+    # grouped into threads; idle threads are archived as one compressed blob per thread and
+    # keep their message ids, so paging cursors stay valid across archival.
+    def __init__(
+        self,
+        path: Union[str, Path],
+        thread_idle: float = SUPPORT_THREAD_IDLE,
+        archive_after: float = SUPPORT_ARCHIVE_AFTER,
+    ) -> None:
+        self.path = Path(path)
+        self.thread_idle = thread_idle
+        self.archive_after = archive_after
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._ready_lock:
+                if not self._ready:
+                    conn.executescript(SUPPORT_SCHEMA)
+                    self._ready = True
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def latest_conversation(self, user_id: int) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT id FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        return row["id"] if row else None
+
+    def post(self, user_id: int, messages: List[Dict[str, Any]], conversation_id: Optional[int] = None) -> int:
+        # Without an explicit thread the latest one is continued while it is still active;
+        # otherwise a new thread starts and the user's idle threads are archived on the way.
+        now = time.time()
+        with self._transaction() as conn:
+            if conversation_id is not None:
+                row = self._owned(conn, user_id, conversation_id)
+                if row["state"] == "archived":
+                    self._restore(conn, row)
+            else:
+                row = conn.execute(
+                    "SELECT id, state, updated FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT 1",
+                    (user_id,),
+                ).fetchone()
+                if row is not None and row["state"] == "open" and now - row["updated"] < self.thread_idle:
+                    conversation_id = row["id"]
+                else:
+                    self._archive(conn, now - self.archive_after, user_id)
+                    subject = next((msg["message"] for msg in messages if msg["sender"] == "user"), "")
+                    conversation_id = conn.execute(
+                        "INSERT INTO conversations (user_id, subject, created, updated) VALUES (?, ?, ?, ?)",
+                        (user_id, subject[:SUBJECT_LENGTH], now, now),
+                    ).lastrowid
+            self._insert(conn, conversation_id, messages, now)
+        return conversation_id
+
+    def import_messages(self, user_id: int, messages: List[Dict[str, Any]]) -> Optional[int]:
+        # Chat history carried on a user record from before this store becomes one thread.
+        if not messages:
+            return None
+        now = time.time()
+        with self._transaction() as conn:
+            latest = conn.execute(
+                "SELECT MAX(id) FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            if latest is not None:
+                # Another request got there first.
+                return latest
+            subject = next((msg["message"] for msg in messages if msg["sender"] == "user"), "")
+            conversation_id = conn.execute(
+                "INSERT INTO conversations (user_id, subject, created, updated) VALUES (?, ?, ?, ?)",
+                (user_id, subject[:SUBJECT_LENGTH], now, now),
+            ).lastrowid
+            self._insert(conn, conversation_id, messages, now)
+        return conversation_id
+
+    def conversations(self, user_id: int, before: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        query = "SELECT id, subject, state, message_count, created, updated FROM conversations WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def messages(
+        self, user_id: int, conversation_id: int, before: Optional[int] = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        # Newest first, `before` being a message id, like the transaction history pages.
+        conn = self.conn
+        row = self._owned(conn, user_id, conversation_id)
+        if row["state"] == "archived":
+            archived = _unpack(row["archive"])
+            if before is not None:
+                archived = [msg for msg in archived if msg["id"] < before]
+            return archived[::-1][:limit]
+        query = "SELECT id, sender, message, timestamp FROM messages WHERE conversation_id = ?"
+        params: List[Any] = [conversation_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(msg) for msg in conn.execute(query, params)]
+
+    def archive(self, older_than: Optional[float] = None) -> int:
+        cutoff = time.time() - (self.archive_after if older_than is None else older_than)
+        with self._transaction() as conn:
+            return self._archive(conn, cutoff)
+
+    def delete_user(self, user_id: int) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT state, COUNT(*) AS count FROM conversations GROUP BY state")
+        return {row["state"]: row["count"] for row in rows}
+
+    @staticmethod
+    def _owned(conn: sqlite3.Connection, user_id: int, conversation_id: int) -> sqlite3.Row:
+        row = conn.execute(
+            "SELECT id, state, archive FROM conversations WHERE id = ? AND user_id = ?", (conversation_id, user_id)
+        ).fetchone()
+        if row is None:
+            raise UnknownConversationError(conversation_id)
+        return row
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, conversation_id: int, messages: List[Dict[str, Any]], now: float) -> None:
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, sender, message, timestamp) VALUES (?, ?, ?, ?)",
+            [(conversation_id, msg["sender"], msg["message"], msg["timestamp"]) for msg in messages],
+        )
+        conn.execute(
+            "UPDATE conversations SET message_count = message_count + ?, updated = ? WHERE id = ?",
+            (len(messages), now, conversation_id),
+        )
+
+    @staticmethod
+    def _archive(conn: sqlite3.Connection, cutoff: float, user_id: Optional[int] = None) -> int:
+        query = "SELECT id FROM conversations WHERE state = 'open' AND updated < ?"
+        params: List[Any] = [cutoff]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        archived = 0
+        for row in conn.execute(query, params).fetchall():
+            rows = conn.execute(
+                "SELECT id, sender, message, timestamp FROM messages WHERE conversation_id = ? ORDER BY id", (row["id"],)
+            ).fetchall()
+            conn.execute(
+                "UPDATE conversations SET state = 'archived', archive = ? WHERE id = ?", (_pack(rows), row["id"])
+            )
+            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (row["id"],))
+            archived += 1
+        return archived
+
+    @staticmethod
+    def _restore(conn: sqlite3.Connection, row: sqlite3.Row) -> None:
+        # Replying to an archived thread unpacks it again, ids included.
+        conn.executemany(
+            "INSERT INTO messages (id, conversation_id, sender, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(msg["id"], row["id"], msg["sender"], msg["message"], msg["timestamp"]) for msg in _unpack(row["archive"])],
+        )
+        conn.execute("UPDATE conversations SET state = 'open', archive = NULL WHERE id = ?", (row["id"],))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+from typing import Any, Iterator, List
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import Posting, Storage  # noqa: E402
+
+BACKENDS = ("json", "sqlite")
+OPENING_BALANCE = 500.0
+
+
+def storage_path(tmp_path: Path, backend: str) -> Path:
+    return tmp_path / ("bank.db" if backend == "sqlite" else "bank.json")
+
+
+@pytest.fixture(params=BACKENDS)
+def app_module(request: Any, tmp_path: Path, monkeypatch: Any) -> Iterator[Any]:
+    # app.py opens its storage at import time, so each test gets a fresh import on its own files.
+    monkeypatch.setenv("ALTERNATIF_BANK_STORAGE", str(storage_path(tmp_path, request.param)))
+    module = importlib.reload(sys.modules["app"]) if "app" in sys.modules else importlib.import_module("app")
+    module.app.config["TESTING"] = True
+    yield module
+    if hasattr(module.storage, "close"):
+        module.storage.close()
+
+
+def sign_up(app_module: Any, full_name: str, contact: str) -> Any:
+    client = app_module.app.test_client()
+    client.post("/register", data={"full_name": full_name, "contact": contact, "contact_type": "email"})
+    response = client.post("/verify", data={"otp": "123456"})
+    assert response.status_code == 302 and "/dashboard" in response.location
+    return client
+
+
+def seed_users(storage: Storage, count: int) -> List[str]:
+    ibans = []
+    for index in range(count):
+        user = storage.create_user(
+            {
+                "full_name": f"Kullanıcı {index}",
+                "contact": f"user{index}@example.com",
+                "contact_type": "email",
+                "biometric_enabled": False,
+                "kyc_status": "verified",
+                "language": "tr",
+                "theme": "light",
+                "notifications_enabled": True,
+                "accounts": [
+                    {"name": "Vadesiz", "iban": f"TR{index:024d}", "balance": OPENING_BALANCE, "transactions": []}
+                ],
+                "transactions": [],
+                "cards": [],
+                "payments": [],
+                "notifications": [],
+            }
+        )
+        ibans.append(user["accounts"][0]["iban"])
+    return ibans
+
+
+def transfer(
+    storage: Storage, source: str, target: str, amount: float, channel: str = "FAST", date: str = "2024-05-01 10:00"
+) -> None:
+    trx = {"date": date, "description": "Test", "channel": channel}
+    storage.post(
+        [
+            Posting(source, -amount, {**trx, "amount": -amount, "counterparty": target}),
+            Posting(target, amount, {**trx, "amount": amount, "counterparty": source}),
+        ]
+    )
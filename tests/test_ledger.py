@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import random
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from conftest import BACKENDS, OPENING_BALANCE, seed_users, storage_path, transfer
+from storage import InsufficientFundsError, JsonStorage, Storage, open_storage
+
+def ledger_problems(storage: Storage, users: int) -> List[str]:
+    # Every balance must equal its opening balance plus its journal, and money is only moved.
+    problems = []
+    total = 0.0
+    for user_id in range(1, users + 1):
+        account = storage.get_user(user_id)["accounts"][0]
+        moved = sum(row["amount"] for row in storage.transactions(user_id))
+        if round(OPENING_BALANCE + moved, 2) != round(account["balance"], 2):
+            problems.append(f"{account['iban']}: {OPENING_BALANCE} + {moved:.2f} != {account['balance']}")
+        if account["balance"] < 0:
+            problems.append(f"{account['iban']} overdrawn: {account['balance']}")
+        total += account["balance"]
+    if round(total, 2) != round(OPENING_BALANCE * users, 2):
+        problems.append(f"total changed: {OPENING_BALANCE * users} -> {total:.2f}")
+    return problems
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_concurrent_transfers_conserve_balances(tmp_path: Path, backend: str) -> None:
+    path = storage_path(tmp_path, backend)
+    ibans = seed_users(open_storage(path), 6)
+    # Two storage objects on the same files stand in for two worker processes.
+    workers = [open_storage(path), open_storage(path)]
+    completed: Dict[int, int] = {}
+
+    def run(index: int) -> None:
+        rng = random.Random(index)
+        storage = workers[index % len(workers)]
+        done = 0
+        for _ in range(60):
+            source, target = rng.sample(ibans, 2)
+            try:
+                transfer(storage, source, target, rng.choice((5.0, 40.0, 150.0)))
+                done += 1
+            except InsufficientFundsError:
+                pass
+        completed[index] = done
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    fresh = open_storage(path)
+    assert ledger_problems(fresh, len(ibans)) == []
+    rows = sum(1 for user_id in range(1, len(ibans) + 1) for _ in fresh.transactions(user_id))
+    assert rows == 2 * sum(completed.values())
+
+
+def test_wal_replays_after_truncated_last_record(tmp_path: Path) -> None:
+    path = storage_path(tmp_path, "json")
+    # No checkpoints, so every posting below lives only in the WAL.
+    storage = JsonStorage(path, checkpoint_entries=10_000, checkpoint_interval=3600)
+    ibans = seed_users(storage, 3)
+    transfer(storage, ibans[0], ibans[1], 25.0)
+    transfer(storage, ibans[1], ibans[2], 10.0)
+    balances = [storage.get_user(user_id)["accounts"][0]["balance"] for user_id in (1, 2, 3)]
+    transfer(storage, ibans[2], ibans[0], 99.0)
+
+    # A writer that died mid-append leaves a torn last record behind.
+    wal_path = storage.wal.path
+    wal_path.write_bytes(wal_path.read_bytes()[:-7])
+
+    recovered = JsonStorage(path, checkpoint_entries=10_000, checkpoint_interval=3600)
+    assert [recovered.get_user(user_id)["accounts"][0]["balance"] for user_id in (1, 2, 3)] == balances
+    assert ledger_problems(recovered, 3) == []
+
+    transfer(recovered, ibans[2], ibans[0], 5.0)
+    reopened = JsonStorage(path)
+    assert reopened.get_user(1)["accounts"][0]["balance"] == balances[0] + 5.0
+    assert ledger_problems(reopened, 3) == []
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Any
+
+from conftest import sign_up
+
+
+def test_etag_changes_after_reset_and_new_posting(app_module: Any) -> None:
+    client = sign_up(app_module, "Ali Veli", "ali@example.com")
+    client.post("/pay", data={"biller": "Su", "customer_no": "42", "bill_amount": "10"})
+    before = client.get("/export/csv")
+    assert before.status_code == 200
+
+    # A reset rebuilds the same seed history; one more posting brings the row count back to
+    # where it was, and on SQLite the freed row ids are handed out again.
+    client.post("/reset")
+    client.post("/pay", data={"biller": "Su", "customer_no": "42", "bill_amount": "25"})
+    after = client.get("/export/csv", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert b"-25.00" in after.get_data() and b"-10.00" not in after.get_data()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from conftest import BACKENDS, seed_users, storage_path, transfer
+from storage import Storage, open_storage
+
+
+def test_incomplete_backend_fails_at_creation() -> None:
+    class Partial(Storage):
+        def load_data(self) -> Dict[str, Any]:
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_implement_the_interface(tmp_path: Path, backend: str) -> None:
+    assert isinstance(open_storage(storage_path(tmp_path, backend)), Storage)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_filtered_pages_match_the_filtered_history(tmp_path: Path, backend: str) -> None:
+    storage = open_storage(storage_path(tmp_path, backend))
+    ibans = seed_users(storage, 2)
+    channels = ["FAST", "Havale", "Kart", "Ödeme"]
+    for day in range(1, 29):
+        transfer(storage, ibans[0], ibans[1], 1.0, channels[day % 4], f"2024-03-{day:02d} 09:00")
+    # An entry dated back in time, as an imported history would have.
+    transfer(storage, ibans[0], ibans[1], 1.0, "Kart", "2024-03-10 18:00")
+    filters: Dict[str, Any] = {"iban": ibans[0], "channels": ["Kart", "FAST"], "date_from": "2024-03-05", "date_to": "2024-03-20"}
+
+    expected = [row["id"] for row in storage.transactions(1, **filters)]
+    # Even days 6..20 carry Kart or FAST, plus the back-dated entry.
+    assert len(expected) == 9 and all(
+        row["channel"] in ("Kart", "FAST") and "2024-03-05" <= row["date"] < "2024-03-21"
+        for row in storage.transactions(1, **filters)
+    )
+    paged, before = [], None
+    while True:
+        page = [row["id"] for row in storage.transactions(1, before=before, limit=3, **filters)]
+        if not page:
+            break
+        paged += page
+        before = page[-1]
+    assert paged == expected == sorted(expected, reverse=True)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+import codec
+from metrics import count_io
+
+try:
+    import fcntl
+except ImportError:
+    # No flock() (Windows): the lock degrades to a no-op and only one process may write.
+    fcntl = None
+
+
+def fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def replace_file(path: Path, payload: bytes) -> None:
+    # Readers only ever see the old or the new file: the payload is made durable under a
+    # temporary name and then renamed over the target.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp_path.open("wb") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    fsync_dir(path.parent)
+
+
+class FileLock:
+    # An flock() on a side file, shared by readers and exclusive for writers, so several
+    # worker processes can use the same data files. flock belongs to the open file, so all
+    # threads of a process share one handle: callers must already serialise their threads
+    # (JsonStorage holds its RLock), and nested acquisitions only bump a depth counter.
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._pid = 0
+        self._depth = 0
+        self._exclusive = False
+
+    @property
+    def held(self) -> bool:
+        return self._depth > 0
+
+    def _handle(self) -> int:
+        # A forked child must not inherit the parent's open file: both would "hold" the lock.
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def hold(self, exclusive: bool = True) -> Iterator[None]:
+        if self._depth:
+            if exclusive and not self._exclusive:
+                raise RuntimeError(f"{self.path.name}: a shared lock cannot be upgraded")
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        fd = self._handle() if fcntl is not None else None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._depth, self._exclusive = 1, exclusive
+        try:
+            yield
+        finally:
+            self._depth, self._exclusive = 0, False
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class WriteAheadLog:
+    def __init__(self, path: Union[str, Path], commit_window: float = 0.0) -> None:
+        self.path = Path(path)
+        self.commit_window = commit_window
+        self._handle: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        self._cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def inode(self) -> Optional[int]:
+        # Checkpoints replace the file, so a new inode tells other processes that their
+        # offsets into the old one no longer apply.
+        try:
+            return self.path.stat().st_ino
+        except FileNotFoundError:
+            return None
+
+    def _open(self) -> BinaryIO:
+        try:
+            inode: Optional[int] = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._handle is None or inode != self._inode:
+            if self._handle is not None:
+                self._handle.close()
+            self._handle = open(self.path, "ab", buffering=0)
+            self._inode = os.fstat(self._handle.fileno()).st_ino
+        return self._handle
+
+    def append(self, record: bytes) -> int:
+        self._open().write(record)
+        count_io("wal", "write", len(record))
+        with self._cond:
+            self._written += 1
+            return self._written
+
+    def sync(self, ticket: int) -> None:
+        # Group commit: whoever finds no fsync in flight issues one that covers every record
+        # written so far, and everyone who arrived meanwhile waits for it instead of queueing
+        # an fsync of their own.
+        with self._cond:
+            while self._synced < ticket:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                handle = self._handle
+                self._cond.release()
+                try:
+                    if self.commit_window:
+                        time.sleep(self.commit_window)
+                    target = self._written
+                    if handle is not None:
+                        os.fsync(handle.fileno())
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._synced = max(self._synced, target)
+
+    def read(self, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        try:
+            handle = self.path.open("rb")
+        except FileNotFoundError:
+            return
+        start = offset
+        with handle:
+            handle.seek(offset)
+            try:
+                for line in handle:
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    yield offset, codec.loads(line)
+            finally:
+                count_io("wal", "read", offset - start)
+
+    def truncate(self, offset: int) -> None:
+        if self.size() > offset:
+            with self.path.open("r+b") as handle:
+                handle.truncate(offset)
+                os.fsync(handle.fileno())
+
+    def rewrite(self, folded: int) -> None:
+        # Drops the first `folded` bytes once a checkpoint has made them redundant, keeping
+        # whatever was appended after the checkpoint started.
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            try:
+                with self.path.open("rb") as handle:
+                    handle.seek(folded)
+                    tail = handle.read()
+            except FileNotFoundError:
+                tail = b""
+            replace_file(self.path, tail)
+            count_io("wal", "write", len(tail))
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._synced = self._written